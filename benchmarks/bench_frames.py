@@ -0,0 +1,102 @@
+"""Payload size and codec cost: JSON vs the binary frames of utils/binary_frames.py.
+
+Checks that every frame kind round-trips (decode_frame(encode_frame(m)) == m,
+and layouts against the masks they were built from), then reports bytes on
+the wire and encode/decode time per frame for typical lobby and tick frames
+and for /generate-labyrinth layouts of a few sizes. Exits non-zero if a
+round trip fails.
+
+    python -m benchmarks.bench_frames
+    python -m benchmarks.bench_frames --sizes 10 50 200 --repeat 2000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from utils import binary_frames
+from utils.corrected_labyrinth_backend_seed_fixed import tiles_from_masks
+from utils.labyrinth_grid import generate_masks
+
+def client_ids(n: int):
+    return [f"phone-{i:04d}-{random.getrandbits(32):08x}" for i in range(n)]
+
+def sample_frames():
+    players = client_ids(6)
+    readiness = [{"client_id": cid, "ready": i % 2 == 0} for i, cid in enumerate(players)]
+    cells = lambda n: [[random.randrange(50), random.randrange(50), random.randrange(16)] for _ in range(n)]
+    return {
+        "full": {"players": readiness, "all_ready": False, "version": 41},
+        "snapshot": {"type": "snapshot", "players": readiness, "all_ready": False, "version": 41},
+        "delta": {
+            "type": "delta", "from_version": 41, "version": 43,
+            "changes": [{"client_id": players[0], "ready": True}, {"client_id": players[1], "ready": None}],
+            "all_ready": False
+        },
+        "tick (6 moves)": {
+            "type": "tick", "tick": 1234,
+            "positions": [{"client_id": cid, "x": random.randrange(50), "y": random.randrange(50)} for cid in players],
+            "fog": [{"client_id": cid, "cells": cells(4)} for cid in players]
+        },
+        "tick (empty fog)": {
+            "type": "tick", "tick": 7,
+            "positions": [{"client_id": players[0], "x": 3, "y": 4}],
+            "fog": []
+        }
+    }
+
+def per_call_us(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    failures = 0
+
+    print(f"{'frame':<22}{'json B':>10}{'binary B':>10}{'ratio':>8}{'json enc/dec us':>18}{'bin enc/dec us':>18}")
+    for name, message in sample_frames().items():
+        encoded = binary_frames.encode_frame(message)
+        if encoded is None or binary_frames.decode_frame(encoded) != message:
+            print(f"round trip FAILED: {name}")
+            failures += 1
+            continue
+        text = json.dumps(message)
+        json_us = per_call_us(lambda: json.dumps(message), args.repeat) + per_call_us(lambda: json.loads(text), args.repeat)
+        bin_us = (per_call_us(lambda: binary_frames.encode_frame(message), args.repeat)
+                  + per_call_us(lambda: binary_frames.decode_frame(encoded), args.repeat))
+        print(f"{name:<22}{len(text):>10}{len(encoded):>10}{len(text) / len(encoded):>7.1f}x{json_us:>18.1f}{bin_us:>18.1f}")
+
+    if binary_frames.encode_frame({"type": "unknown"}) is not None:
+        print("round trip FAILED: unknown frame type was encoded")
+        failures += 1
+
+    for size in args.sizes:
+        masks, start_x, start_y, seed = generate_masks(size, f"bench-{size}")
+        name = f"layout {size}x{size}"
+        encoded = binary_frames.encode_layout(size, start_x, start_y, seed, masks)
+        decoded = binary_frames.decode_frame(encoded)
+        if decoded["masks"] != bytes(masks) or (decoded["start_x"], decoded["start_y"], decoded["seed"]) != (start_x, start_y, seed):
+            print(f"round trip FAILED: {name}")
+            failures += 1
+            continue
+        # The JSON body /generate-labyrinth sends without the binary Accept header
+        body = {"seed": seed, "start_x": start_x, "start_y": start_y, "tiles": tiles_from_masks(masks, size)}
+        text = json.dumps(body)
+        repeat = max(1, args.repeat // (size * size // 100 + 1))
+        json_us = per_call_us(lambda: json.dumps(body), repeat) + per_call_us(lambda: json.loads(text), repeat)
+        bin_us = (per_call_us(lambda: binary_frames.encode_layout(size, start_x, start_y, seed, masks), repeat)
+                  + per_call_us(lambda: binary_frames.decode_frame(encoded), repeat))
+        print(f"{name:<22}{len(text):>10}{len(encoded):>10}{len(text) / len(encoded):>7.1f}x{json_us:>18.1f}{bin_us:>18.1f}")
+
+    if failures:
+        print(f"{failures} round trip(s) failed")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
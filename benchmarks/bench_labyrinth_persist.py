@@ -0,0 +1,112 @@
+"""Time generate_labyrinth against the old one-ORM-object-per-tile persistence.
+
+The legacy path below is the generator as it was before the bulk write path:
+commit + refresh the labyrinth, then db.add() one Tile per cell and commit again.
+
+    python -m benchmarks.bench_labyrinth_persist
+    python -m benchmarks.bench_labyrinth_persist --url postgresql://... --repeat 20
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.base import Base
+from models.equipment import Equipment  # noqa: F401 - registers the mapper
+from models.game_entities import Entity  # noqa: F401 - equipment, skills and specials reference entities
+from models.game_session import GameSession  # noqa: F401
+from models.labyrinth import Labyrinth
+from models.mobile_client import MobileClient  # noqa: F401
+from models.player import Player  # noqa: F401
+from models.skills import Skill  # noqa: F401
+from models.specials import Special  # noqa: F401
+from models.tile import Tile
+from utils.corrected_labyrinth_backend_seed_fixed import (
+    DIRECTIONS,
+    OPPOSITE,
+    generate_labyrinth,
+    get_tile_type_from_directions,
+)
+
+
+def legacy_generate_labyrinth(size, seed, db):
+    random.seed(seed)
+    visited = [[False] * size for _ in range(size)]
+    tile_map = {}
+
+    def dfs(x, y):
+        visited[y][x] = True
+        directions = list(DIRECTIONS.keys())
+        random.shuffle(directions)
+        current_open = []
+        for direction in directions:
+            nx, ny = x + DIRECTIONS[direction][0], y + DIRECTIONS[direction][1]
+            if 0 <= nx < size and 0 <= ny < size and not visited[ny][nx]:
+                current_open.append(direction)
+                dfs(nx, ny)
+                tile_map[(nx, ny)]['open_directions'].append(OPPOSITE[direction])
+        tile_map[(x, y)] = {'x': x, 'y': y, 'open_directions': current_open}
+
+    start_x, start_y = random.randint(0, size - 1), random.randint(0, size - 1)
+    dfs(start_x, start_y)
+
+    labyrinth = Labyrinth(size=size, seed=seed, start_x=start_x, start_y=start_y)
+    db.add(labyrinth)
+    db.commit()
+    db.refresh(labyrinth)
+
+    for (x, y), tile_data in tile_map.items():
+        directions = sorted(tile_data['open_directions'])
+        db.add(Tile(
+            labyrinth_id=labyrinth.id,
+            x=x,
+            y=y,
+            type=get_tile_type_from_directions(directions),
+            open_directions=directions[0] if len(directions) == 1 else json.dumps(directions)
+        ))
+    db.commit()
+    return labyrinth
+
+
+def median_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite://", help="database URL (default: in-memory SQLite)")
+    parser.add_argument("--sizes", default="4,7,10", help="comma separated board sizes")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, expire_on_commit=False)
+
+    print(f"{'size':>6} {'legacy ms':>10} {'bulk ms':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        db = Session()
+        try:
+            legacy = median_seconds(
+                lambda: legacy_generate_labyrinth(size, uuid.uuid4().hex, db), args.repeat
+            )
+            bulk = median_seconds(
+                lambda: generate_labyrinth(size, uuid.uuid4().hex, db), args.repeat
+            )
+        finally:
+            db.close()
+        print(f"{size:>6} {legacy * 1000:>10.2f} {bulk * 1000:>10.2f} {legacy / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
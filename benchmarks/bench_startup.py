@@ -0,0 +1,81 @@
+"""Cold-start cost of an app worker: import time and time to first request.
+
+Each run is a fresh interpreter, as on a worker spawn or autoscale event:
+
+* import: `import main` alone, timed inside the child process
+* first request: spawn uvicorn, poll GET /api/metrics/workers until it answers
+
+The database is bootstrapped once beforehand (as startup.sh does), so neither
+number includes schema or seed work. Exits non-zero when a median exceeds its
+threshold, so it can run as a regression check in CI:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --max-import-ms 800 --max-ready-ms 2000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_import(env) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=env, check=True, capture_output=True, text=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def time_first_request(env, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/metrics/workers", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"uvicorn did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500, help="fail if the median import exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, default=4000, help="fail if the median time to first request exceeds this")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench_startup.db")
+    subprocess.run([sys.executable, "-m", "bootstrap"], env=env, check=True, capture_output=True)
+
+    imports = [time_import(env) * 1000 for _ in range(args.runs)]
+    ready = [time_first_request(env, timeout=30) * 1000 for _ in range(args.runs)]
+
+    failed = False
+    print(f"{'phase':>14} {'median ms':>10} {'max ms':>8} {'limit ms':>9}")
+    for label, samples, limit in (("import", imports, args.max_import_ms), ("first request", ready, args.max_ready_ms)):
+        median = statistics.median(samples)
+        print(f"{label:>14} {median:>10.0f} {max(samples):>8.0f} {limit:>9.0f}")
+        failed |= median > limit
+    if failed:
+        print("Startup regression: a median exceeded its limit", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
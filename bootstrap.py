@@ -0,0 +1,58 @@
+"""One-time database setup: create missing tables, upgrade existing ones and load the seed CSVs.
+
+Run once per deploy, before the app workers start (startup.sh does this):
+
+    python -m bootstrap
+    python -m bootstrap --skip-seed
+
+Safe to re-run: only missing tables and indexes are created, columns added since a
+database was created are added in place (db/migrations.py), and the seed loader
+skips CSVs whose checksum has not changed.
+"""
+import argparse
+import logging
+import time
+
+import config
+from db.engine import get_engine
+from db.init_data import load_seed_data
+from db.migrations import upgrade_schema
+from models.base import Base
+# Every mapped model must be imported so create_all sees its table
+from models.equipment import Equipment  # noqa: F401
+from models.fog_reveal import FogReveal  # noqa: F401
+from models.game_entities import Entity  # noqa: F401
+from models.game_session import GameSession  # noqa: F401
+from models.labyrinth import Labyrinth  # noqa: F401
+from models.mobile_client import MobileClient  # noqa: F401
+from models.player import Player  # noqa: F401
+from models.seed_checksum import SeedChecksum  # noqa: F401
+from models.skills import Skill  # noqa: F401
+from models.specials import Special  # noqa: F401
+from models.tile import Tile  # noqa: F401
+
+logger = logging.getLogger("bootstrap")
+
+def bootstrap(seed: bool = True):
+    started = time.perf_counter()
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist: new columns are added first,
+    # then indexes added to a model later are created here
+    upgrade_schema(engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    if seed:
+        load_seed_data(engine, config.SEED_DATA_DIR)
+    logger.info("Database bootstrap finished in %.1f ms", (time.perf_counter() - started) * 1000)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip-seed", action="store_true", help="only create missing tables")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(name)s: %(message)s")
+    bootstrap(seed=not args.skip_seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+# db/async_session.py
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from db.engine import get_async_engine
+
+# Async counterpart of db/session.py for request handlers running on the event
+# loop; scripts and worker threads keep using the synchronous SessionLocal.
+_session_factory = None
+
+def get_async_session_factory() -> async_sessionmaker:
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = async_sessionmaker(bind=get_async_engine(), expire_on_commit=False)
+    return _session_factory
+
+def __getattr__(name):
+    if name == "AsyncSessionLocal":
+        return get_async_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+async def get_async_db():
+    async with get_async_session_factory()() as db:
+        yield db
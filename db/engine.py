@@ -0,0 +1,155 @@
+# db/engine.py
+from contextvars import ContextVar
+from typing import Optional
+import threading
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import config
+
+# The one sync and one async engine every module uses (db.session,
+# db.async_session, bootstrap). Pool sizing, pre-ping, recycle and statement
+# timeout come from config.DB_* settings. Both are built on first use, so the
+# DBAPI drivers are only imported by processes that talk to the database.
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.requests = 0
+        self.request_checkouts_total = 0
+        self.request_checkouts_max = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_request(self, checkouts: int):
+        with self._lock:
+            self.requests += 1
+            self.request_checkouts_total += checkouts
+            self.request_checkouts_max = max(self.request_checkouts_max, checkouts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms": {
+                    "avg": (self.wait_seconds_total / self.checkouts * 1000) if self.checkouts else 0.0,
+                    "max": self.wait_seconds_max * 1000
+                },
+                "connections_per_request": {
+                    "avg": (self.request_checkouts_total / self.requests) if self.requests else 0.0,
+                    "max": self.request_checkouts_max
+                },
+                "requests": self.requests
+            }
+
+pool_metrics = PoolMetrics()
+
+# Set per HTTP request by the middleware in main.py; a one-element list so the
+# count survives FastAPI copying the context into threadpool workers
+request_checkouts: ContextVar[Optional[list]] = ContextVar("request_checkouts", default=None)
+
+class _MeteredPoolMixin:
+    # Times how long a checkout waits for a free (or new) connection
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    pass
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    counter = request_checkouts.get()
+    if counter is not None:
+        counter[0] += 1
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    options = {"echo": config.DB_ECHO}
+    if url.startswith("sqlite"):
+        # SQLite picks its own pool; sizing and server-side timeouts don't apply
+        return options
+    options.update(
+        poolclass=MeteredAsyncQueuePool if is_async else MeteredQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+    )
+    if config.DB_STATEMENT_TIMEOUT_MS:
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(config.DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={config.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def create_tuned_engine(url: str) -> Engine:
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, "checkout", _on_checkout)
+    return engine
+
+def create_tuned_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    async_url = config.async_database_url(url)
+    engine = create_async_engine(async_url, **engine_options(async_url, is_async=True))
+    event.listen(engine.sync_engine, "checkout", _on_checkout)
+    return engine
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _get(kind: str, factory):
+    created = _engines.get(kind)
+    if created is None:
+        with _engines_lock:
+            created = _engines.get(kind)
+            if created is None:
+                created = _engines[kind] = factory(config.DATABASE_URL)
+    return created
+
+def get_engine() -> Engine:
+    return _get("sync", create_tuned_engine)
+
+def get_async_engine():
+    return _get("async", create_tuned_async_engine)
+
+def __getattr__(name):
+    # `from db.engine import engine` still works; it just builds the engine then
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _pool_status(pool):
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0)
+        )
+    return status
+
+def get_pool_stats():
+    # An engine nobody has used yet is reported as None rather than created here
+    sync_engine, async_engine = _engines.get("sync"), _engines.get("async")
+    return {
+        "sync": _pool_status(sync_engine.pool) if sync_engine else None,
+        "async": _pool_status(async_engine.sync_engine.pool) if async_engine else None,
+        **pool_metrics.stats()
+    }
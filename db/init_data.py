@@ -1,80 +1,101 @@
 # db/init_data.py
-import pandas as pd
+from datetime import datetime
+import csv
+import hashlib
+import io
+import logging
+import os
+import time
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 from models.game_entities import Entity  # Import Entity from game_entities
 from models.equipment import Equipment  # Import Equipment from equipment
 from models.skills import Skill  # Import Skill from skills
 from models.specials import Special  # Import Special from specials
+from models.seed_checksum import SeedChecksum
 
-# Function to load data into the database
-def load_data(engine, df_entities, df_equipment, df_skills, df_specials):
-    # Create session for DB interaction
-    session = Session(bind=engine)
+logger = logging.getLogger(__name__)
 
-    try:
-        # Load entities into the 'entities' table first
-        for index, row in df_entities.iterrows():
-            entity = Entity(
-                id=row['id'],
-                name=row['name'],
-                type=row['type'],
-                age=row['age'],
-                role=row['role'],
-                backstory_path=row['backstory_path'],
-                portrait_path=row.get('portrait_path')  # Include portrait_path from the CSV
-            )
-            session.add(entity)
-        
-        # Commit the entities to ensure they are in the database
-        session.commit()
+# Parents before children so foreign keys to entities resolve
+SEED_FILES = [
+    ("entities.csv", Entity),
+    ("equipment.csv", Equipment),
+    ("skills.csv", Skill),
+    ("specials.csv", Special),
+]
 
-        # Log entity IDs to debug
-        print("Entities inserted:")
-        for index, row in df_entities.iterrows():
-            print(f"Inserted Entity ID: {row['id']}")
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
-        # Now load equipment into the 'equipment' table
-        for index, row in df_equipment.iterrows():
-            # Log the entity_id before inserting equipment to debug
-            print(f"Inserting Equipment with entity_id: {row['entity_id']}")
-            
-            # Make sure entity_id in equipment matches the id of an entity already inserted
-            equipment = Equipment(
-                id=row['id'],
-                entity_id=row['entity_id'],  # This should match an existing entity's ID
-                name=row['name'],
-                description=row['description']
-            )
-            session.add(equipment)
+def read_seed_rows(raw: bytes, model):
+    # Only the model's columns are kept; empty cells become NULL
+    columns = set(model.__table__.columns.keys())
+    reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+    return [
+        {key: (value if value != "" else None) for key, value in row.items() if key in columns}
+        for row in reader
+    ]
 
-        # Load skills into the 'skills' table
-        for index, row in df_skills.iterrows():
-            skill = Skill(
-                id=row['id'],
-                entity_id=row['entity_id'],
-                name=row['name'],
-                description=row['description']
-            )
-            session.add(skill)
+def upsert_rows(session: Session, model, rows, conflict_columns=None):
+    # conflict_columns: a unique key to match existing rows on, instead of the
+    # primary key; matched rows keep their primary key
+    if not rows:
+        return
+    dialect_insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if dialect_insert is None:
+        for row in rows:
+            session.merge(model(**row))
+        return
+    table = model.__table__
+    stmt = dialect_insert(table)
+    primary_key = [c.name for c in table.primary_key.columns]
+    keys = list(conflict_columns or primary_key)
+    updates = {name: stmt.excluded[name] for name in rows[0] if name not in keys and name not in primary_key}
+    if updates:
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    session.execute(stmt, rows)
 
-        # Load specials into the 'specials' table
-        for index, row in df_specials.iterrows():
-            special = Special(
-                id=row['id'],
-                entity_id=row['entity_id'],
-                description=row['description']
-            )
-            session.add(special)
+def load_seed_data(engine, seed_dir: str):
+    """Upsert the CSVs in seed_dir whose sha256 changed since the last load.
 
-        # Commit all changes to the database
-        session.commit()
-        print("Data successfully loaded into the database.")
+    Unchanged files are skipped, rows are never deleted, and everything runs in
+    one transaction. Returns {filename: rows upserted, or None if skipped}.
+    """
+    started = time.perf_counter()
+    results = {}
+    with Session(bind=engine) as session:
+        known = {c.filename: c for c in session.scalars(select(SeedChecksum))}
+        try:
+            for filename, model in SEED_FILES:
+                path = os.path.join(seed_dir, filename)
+                if not os.path.exists(path):
+                    continue
+                with open(path, "rb") as f:
+                    raw = f.read()
+                digest = hashlib.sha256(raw).hexdigest()
+                checksum = known.get(filename)
+                if checksum is not None and checksum.sha256 == digest:
+                    results[filename] = None
+                    continue
+                rows = read_seed_rows(raw, model)
+                upsert_rows(session, model, rows)
+                if checksum is None:
+                    checksum = SeedChecksum(filename=filename)
+                    session.add(checksum)
+                checksum.sha256 = digest
+                checksum.row_count = len(rows)
+                checksum.loaded_at = datetime.utcnow()
+                results[filename] = len(rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.exception("Loading seed data from %s failed", seed_dir)
+            raise
 
-    except Exception as e:
-        # If any error occurs, roll back the transaction
-        session.rollback()
-        print(f"Error loading data: {e}")
-
-    finally:
-        # Close the session
-        session.close()
+    summary = ", ".join(
+        f"{name}={'unchanged' if count is None else f'{count} rows'}" for name, count in results.items()
+    )
+    logger.info("Seed data loaded in %.1f ms: %s", (time.perf_counter() - started) * 1000, summary)
+    return results
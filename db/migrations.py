@@ -0,0 +1,97 @@
+# db/migrations.py
+"""Schema upgrades for databases created by earlier versions.
+
+create_all only adds missing tables, so columns and constraints added to
+existing tables are applied here, by `python -m bootstrap`, before the
+indexes that depend on them are created. Every step checks the live schema
+first, so upgrade_schema is safe to run on every deploy.
+"""
+from collections import defaultdict
+from datetime import datetime
+import logging
+from sqlalchemy import delete, func, inspect, select, text, update
+from models.base import Base
+
+logger = logging.getLogger(__name__)
+
+# (table, column) added to a table that already existed in deployed databases
+ADDED_COLUMNS = [
+    ("labyrinths", "layout"),
+    ("labyrinths", "layout_format"),
+    ("labyrinths", "revealed_bits"),
+    ("labyrinths", "pooled"),
+    ("players", "client_id"),
+]
+
+def add_missing_columns(conn, inspector):
+    for table_name, column_name in ADDED_COLUMNS:
+        if not inspector.has_table(table_name):
+            continue
+        if column_name in {c["name"] for c in inspector.get_columns(table_name)}:
+            continue
+        column = Base.metadata.tables[table_name].c[column_name]
+        # Added columns are all nullable, so no default or backfill is needed
+        conn.execute(text(
+            f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column.type.compile(dialect=conn.dialect)}"
+        ))
+        logger.info("Added column %s.%s", table_name, column_name)
+
+def dedupe_labyrinths(conn, inspector):
+    """Keep one labyrinth per (size, seed) so ix_labyrinths_size_seed can be built.
+
+    Older versions stored a new row for every generation. Layouts are
+    deterministic in (size, seed), so the oldest row stands in for the others:
+    their sessions are pointed at it and their rows and tiles are deleted.
+    """
+    if "ix_labyrinths_size_seed" in {ix["name"] for ix in inspector.get_indexes("labyrinths")}:
+        return
+    labyrinths = Base.metadata.tables["labyrinths"]
+    game_sessions = Base.metadata.tables["game_sessions"]
+    tiles = Base.metadata.tables["tiles"]
+    duplicated = (
+        select(labyrinths.c.size, labyrinths.c.seed)
+        .where(labyrinths.c.seed.is_not(None))
+        .group_by(labyrinths.c.size, labyrinths.c.seed)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    groups = defaultdict(list)
+    for row in conn.execute(
+        select(labyrinths.c.id, labyrinths.c.size, labyrinths.c.seed, labyrinths.c.created_at)
+        .join(duplicated, (labyrinths.c.size == duplicated.c.size) & (labyrinths.c.seed == duplicated.c.seed))
+    ):
+        groups[(row.size, row.seed)].append(row)
+    removed = 0
+    for rows in groups.values():
+        rows.sort(key=lambda r: (r.created_at or datetime.min, str(r.id)))
+        keep, duplicates = rows[0].id, [r.id for r in rows[1:]]
+        conn.execute(update(game_sessions).where(game_sessions.c.labyrinth_id.in_(duplicates)).values(labyrinth_id=keep))
+        conn.execute(delete(tiles).where(tiles.c.labyrinth_id.in_(duplicates)))
+        conn.execute(delete(labyrinths).where(labyrinths.c.id.in_(duplicates)))
+        removed += len(duplicates)
+    if removed:
+        logger.info("Removed %d duplicate labyrinths across %d (size, seed) pairs", removed, len(groups))
+
+def cascade_player_sessions(conn, inspector):
+    # players.game_session_id gained ON DELETE CASCADE; SQLite cannot alter a
+    # foreign key in place, and its foreign keys are not enforced by default
+    if conn.dialect.name != "postgresql":
+        return
+    for fk in inspector.get_foreign_keys("players"):
+        if fk["referred_table"] != "game_sessions":
+            continue
+        if (fk.get("options", {}).get("ondelete") or "").upper() == "CASCADE":
+            continue
+        conn.execute(text(f'ALTER TABLE players DROP CONSTRAINT "{fk["name"]}"'))
+        conn.execute(text(
+            f'ALTER TABLE players ADD CONSTRAINT "{fk["name"]}" FOREIGN KEY (game_session_id) '
+            "REFERENCES game_sessions (id) ON DELETE CASCADE"
+        ))
+        logger.info("Foreign key %s now cascades on session delete", fk["name"])
+
+def upgrade_schema(engine):
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        add_missing_columns(conn, inspector)
+        dedupe_labyrinths(conn, inspector)
+        cascade_player_sessions(conn, inspector)
@@ -1,13 +1,25 @@
 # db/session.py
 from sqlalchemy.orm import sessionmaker
-from config import DATABASE_URL
-from sqlalchemy import create_engine
+from db.engine import get_engine
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+_session_factory = None
+
+def get_session_factory() -> sessionmaker:
+    # expire_on_commit=False: generate_labyrinth hands back the Labyrinth it just
+    # committed, and callers read its columns without a reload round-trip
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(bind=get_engine(), expire_on_commit=False)
+    return _session_factory
+
+def __getattr__(name):
+    # SessionLocal is bound on first use (see db/engine.py)
+    if name == "SessionLocal":
+        return get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db():
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
@@ -0,0 +1,159 @@
+"""Fog of war: per-player and per-session reveal bitsets.
+
+Each client in a session has a bitset with one bit per cell
+(utils.labyrinth_grid.new_bitset), and the session keeps the union under
+SESSION_KEY. A reveal from (x, y) looks only at the cells visible from there:
+the cell itself, plus straight lines through its open sides until a wall or
+FOG_SIGHT_RANGE cells. Only cells whose bits were still clear are returned,
+as [x, y, mask] with the cell's direction mask; ticks.py applies reveals
+and sends them out in its per-tick frame. Changed bitsets go to the
+fog_reveals table through a write-behind batch. Fog state lives in the
+worker that serves the session, so multi-worker deployments need to route a
+session's game traffic to one worker.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from db.init_data import upsert_rows
+from lobby_view import lobby_views
+from models.fog_reveal import FogReveal
+from session_backend import session_backend
+from utils.labyrinth_grid import DIRECTION_BITS, DIRECTIONS, new_bitset
+from utils.write_behind import WriteBehind, existing_session_ids
+import config
+
+SESSION_KEY = "*"
+
+def visible_cells(masks, size: int, x: int, y: int, sight: int) -> List[int]:
+    cells = [y * size + x]
+    for direction, (dx, dy) in DIRECTIONS.items():
+        bit = DIRECTION_BITS[direction]
+        cx, cy = x, y
+        for _ in range(sight):
+            if not masks[cy * size + cx] & bit:
+                break
+            cx, cy = cx + dx, cy + dy
+            cells.append(cy * size + cx)
+    return cells
+
+def reveal_into(bits: bytearray, cells: List[int]) -> List[int]:
+    # Sets the cells' bits; returns the ones that were not set yet
+    revealed = []
+    for index in cells:
+        byte, bit = index >> 3, 1 << (index & 7)
+        if not bits[byte] & bit:
+            bits[byte] |= bit
+            revealed.append(index)
+    return revealed
+
+def revealed_count(bits) -> int:
+    return int.from_bytes(bits, "little").bit_count()
+
+class SessionFog:
+    def __init__(self, size: int, masks: bytes):
+        self.size = size
+        self.masks = masks
+        self.bits: Dict[str, bytearray] = {SESSION_KEY: new_bitset(size * size)}
+
+    def player_bits(self, client_id: str) -> bytearray:
+        bits = self.bits.get(client_id)
+        if bits is None:
+            bits = self.bits[client_id] = new_bitset(self.size * self.size)
+        return bits
+
+    def reveal(self, client_id: str, x: int, y: int, sight: int) -> Tuple[List[int], List[int]]:
+        # -> (cells new to this client, cells new to the session)
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise ValueError(f"Cell ({x}, {y}) is outside the {self.size}x{self.size} labyrinth")
+        cells = visible_cells(self.masks, self.size, x, y, sight)
+        new_for_player = reveal_into(self.player_bits(client_id), cells)
+        new_for_session = reveal_into(self.bits[SESSION_KEY], new_for_player)
+        return new_for_player, new_for_session
+
+def _write_fog(db: Session, batch: dict):
+    existing = existing_session_ids(db, {session_id for session_id, _ in batch})
+    now = datetime.utcnow()
+    rows = [
+        {
+            "game_session_id": UUID(session_id),
+            "client_id": client_id,
+            "bits": bits,
+            "revealed_count": revealed_count(bits),
+            "updated_at": now
+        }
+        for (session_id, client_id), bits in batch.items()
+        if session_id in existing
+    ]
+    upsert_rows(db, FogReveal, rows)
+    db.commit()
+
+class FogStore:
+    def __init__(self, sight: int, writer: WriteBehind):
+        self.sight = sight
+        self.writer = writer
+        self._sessions: Dict[str, SessionFog] = {}
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self.reveals = 0
+        self.cells_revealed = 0
+
+    async def session(self, session_id: str, db: AsyncSession) -> Optional[SessionFog]:
+        fog = self._sessions.get(session_id)
+        if fog is not None:
+            return fog
+        lock = self._loading.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                fog = self._sessions.get(session_id)
+                if fog is not None:
+                    return fog
+                # Unknown sessions are not remembered here; lobby_views does the lookup
+                record = await lobby_views.labyrinth(session_id, db)
+                if record is None:
+                    return None
+                fog = SessionFog(record.size, record.masks)
+                # Bitsets saved before a restart, all in one query
+                for row in await db.scalars(select(FogReveal).where(FogReveal.game_session_id == UUID(session_id))):
+                    fog.bits[row.client_id] = bytearray(row.bits)
+                self._sessions[session_id] = fog
+                return fog
+        finally:
+            # Also on a miss or a failed load, or the lock would stay behind
+            self._loading.pop(session_id, None)
+
+    def reveal(self, session_id: str, client_id: str, x: int, y: int) -> list:
+        """Reveal what client_id sees from (x, y) in a session loaded with
+        session(); returns the newly revealed [x, y, mask] cells."""
+        fog = self._sessions[session_id]
+        new_for_player, new_for_session = fog.reveal(client_id, x, y, self.sight)
+        self.reveals += 1
+        if not new_for_player:
+            return []
+        self.cells_revealed += len(new_for_player)
+        self.writer.mark((session_id, client_id), bytes(fog.bits[client_id]))
+        if new_for_session:
+            self.writer.mark((session_id, SESSION_KEY), bytes(fog.bits[SESSION_KEY]))
+        size = fog.size
+        return [[index % size, index // size, fog.masks[index]] for index in new_for_player]
+
+    async def _on_event(self, channel: str, message: dict):
+        # All sessions were destroyed (lobby_views.sessions_deleted)
+        if channel == "lobby:*" and message.get("op") == "clear":
+            self._sessions.clear()
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "reveals": self.reveals,
+            "cells_revealed": self.cells_revealed,
+            "write_behind": self.writer.stats()
+        }
+
+fog_store = FogStore(
+    config.FOG_SIGHT_RANGE,
+    WriteBehind("fog", _write_fog, config.FOG_FLUSH_INTERVAL_SECONDS, config.FOG_FLUSH_MAX_PENDING)
+)
+session_backend.subscribe(fog_store._on_event)
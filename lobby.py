@@ -0,0 +1,107 @@
+"""Lobby readiness broadcasts over /ws/{session_id}.
+
+Connections opened with ?protocol=delta receive versioned frames:
+
+    {"type": "snapshot", "version": 7, "players": [...], "all_ready": false}
+    {"type": "delta", "from_version": 7, "version": 9,
+     "changes": [{"client_id": "a", "ready": true}, {"client_id": "b", "ready": null}],
+     "all_ready": false}
+
+Changes carry absolute values ("ready": null means the client left), so a
+delta applies to any client state at from_version or newer. A client whose
+version is older than from_version has missed a frame: it sends
+{"type": "resync", "version": <its version>} and gets a fresh snapshot.
+Other connections keep receiving the full SessionStatus payload. Either way,
+changes that land within LOBBY_COALESCE_WINDOW_SECONDS go out as one frame.
+"""
+from typing import Dict
+import asyncio
+import logging
+from session_backend import session_backend
+from state import ReadinessSnapshot
+import config
+import realtime
+
+logger = logging.getLogger(__name__)
+
+def _players(snapshot: ReadinessSnapshot):
+    return [{"client_id": cid, "ready": ready} for cid, ready in snapshot.players.items()]
+
+def full_frame(snapshot: ReadinessSnapshot) -> dict:
+    # Same shape as schemas.SessionStatus
+    return {"players": _players(snapshot), "all_ready": snapshot.all_ready, "version": snapshot.version}
+
+def snapshot_frame(snapshot: ReadinessSnapshot) -> dict:
+    return {"type": "snapshot", **full_frame(snapshot)}
+
+def delta_frame(from_version: int, snapshot: ReadinessSnapshot, changes) -> dict:
+    return {
+        "type": "delta",
+        "from_version": from_version,
+        "version": snapshot.version,
+        "changes": [{"client_id": cid, "ready": ready} for cid, ready in changes.items()],
+        "all_ready": snapshot.all_ready
+    }
+
+class LobbyBroadcaster:
+    def __init__(self, backend, window: float):
+        self.backend = backend
+        self.window = window
+        self._scheduled: Dict[str, asyncio.Task] = {}
+        self.frames_sent = 0
+        self.updates_coalesced = 0
+
+    def notify(self, session_id: str):
+        # Called after each committed readiness change; the first change in a
+        # window schedules the flush and later ones ride along with it
+        if session_id in self._scheduled:
+            self.updates_coalesced += 1
+            return
+        self._scheduled[session_id] = asyncio.create_task(self._flush_later(session_id))
+
+    async def _flush_later(self, session_id: str):
+        try:
+            await asyncio.sleep(self.window)
+        finally:
+            self._scheduled.pop(session_id, None)
+        try:
+            await self.flush(session_id)
+        except Exception:
+            logger.exception("Lobby broadcast for session %s failed", session_id)
+
+    async def flush(self, session_id: str):
+        # The broadcast cursor lives in the backend, so when several workers
+        # flush the same session each change still goes out exactly once
+        from_version, snapshot, changes = await self.backend.claim_changes(session_id)
+        if snapshot.version == from_version:
+            return
+        if changes is None:
+            # Changelog no longer covers from_version: everyone gets a snapshot
+            delta_message = snapshot_frame(snapshot)
+        else:
+            delta_message = delta_frame(from_version, snapshot, changes)
+        self.frames_sent += 1
+        await realtime.broadcast_session_update(session_id, full_frame(snapshot), delta_message)
+
+    def stats(self):
+        return {
+            "frames_sent": self.frames_sent,
+            "updates_coalesced": self.updates_coalesced,
+            "pending_flushes": len(self._scheduled)
+        }
+
+lobby_broadcaster = LobbyBroadcaster(session_backend, config.LOBBY_COALESCE_WINDOW_SECONDS)
+
+async def _send_snapshot(connection: realtime.SessionConnection):
+    snapshot = await session_backend.snapshot(connection.session_id)
+    realtime.send_to_connection(connection, snapshot_frame(snapshot))
+
+async def _on_connect(connection: realtime.SessionConnection):
+    if connection.protocol == "delta":
+        await _send_snapshot(connection)
+
+async def _on_resync(connection: realtime.SessionConnection, message: dict):
+    await _send_snapshot(connection)
+
+realtime.connect_handlers.append(_on_connect)
+realtime.message_handlers["resync"] = _on_resync
@@ -0,0 +1,151 @@
+"""In-memory lobby read model: one denormalized view per game session.
+
+A view holds the session's details and its connected clients; readiness and
+the version are read from session_backend, which already keeps them in memory.
+Join and leave publish a "lobby:<session_id>" event through the session
+backend, and every worker (this one included) patches its cached view. So
+polling /lobby, /clients or /status costs no queries once a view is cached.
+A session that is not cached is loaded with one indexed query.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.game_session import GameSession
+from models.mobile_client import MobileClient
+from db.session import get_session_factory
+from session_backend import session_backend
+from state import ReadinessSnapshot
+from utils.labyrinth_cache import LabyrinthRecord, labyrinth_cache, load_labyrinth
+from utils.workers import worker_pools
+import config
+
+class LobbyView:
+    def __init__(self, details: dict, clients: Dict[str, str]):
+        self.details = details
+        self.clients = clients  # client_id -> connected_at (ISO), in join order
+
+def session_details(session: GameSession) -> dict:
+    return {
+        "session_id": str(session.id),
+        "labyrinth_id": str(session.labyrinth_id) if session.labyrinth_id else None,
+        "seed": session.seed,
+        "size": session.size,
+        "start_x": session.start_x,
+        "start_y": session.start_y
+    }
+
+def _load_labyrinth(labyrinth_id: UUID) -> Optional[LabyrinthRecord]:
+    with get_session_factory()() as db:
+        return load_labyrinth(labyrinth_id, db)
+
+def lobby_payload(view: LobbyView, snapshot: ReadinessSnapshot) -> dict:
+    return {
+        "session": view.details,
+        "clients": [
+            {"client_id": cid, "connected_at": connected_at, "ready": snapshot.players.get(cid, False)}
+            for cid, connected_at in view.clients.items()
+        ],
+        "all_ready": snapshot.all_ready,
+        "version": snapshot.version
+    }
+
+class LobbyViews:
+    def __init__(self, backend, max_entries: int):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._views = OrderedDict()  # session_id -> LobbyView, least recently used first
+        # Bumped by every event; a view loaded while an event arrived may be
+        # stale, so it is returned but not cached
+        self._generation = 0
+        self.hits = 0
+        self.loads = 0
+        self.events = 0
+
+    async def _load(self, session_id: str, db: AsyncSession) -> Optional[LobbyView]:
+        # Session plus its clients in one query (ix_mobile_clients_game_session_id)
+        rows = (await db.execute(
+            select(GameSession, MobileClient.client_id, MobileClient.connected_at)
+            .outerjoin(MobileClient, MobileClient.game_session_id == GameSession.id)
+            .where(GameSession.id == UUID(session_id))
+            .order_by(MobileClient.connected_at)
+        )).all()
+        if not rows:
+            return None
+        clients = {cid: connected_at.isoformat() for _, cid, connected_at in rows if cid is not None}
+        return LobbyView(session_details(rows[0][0]), clients)
+
+    async def get(self, session_id: str, db: AsyncSession) -> Optional[LobbyView]:
+        view = self._views.get(session_id)
+        if view is not None:
+            self._views.move_to_end(session_id)
+            self.hits += 1
+            return view
+        generation = self._generation
+        view = await self._load(session_id, db)
+        self.loads += 1
+        if view is not None and generation == self._generation:
+            self._views[session_id] = view
+            if len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+        return view
+
+    async def payload(self, session_id: str, db: AsyncSession) -> Optional[dict]:
+        view = await self.get(session_id, db)
+        if view is None:
+            return None
+        return lobby_payload(view, await self.backend.snapshot(session_id))
+
+    async def labyrinth(self, session_id: str, db: AsyncSession) -> Optional[LabyrinthRecord]:
+        # The session's labyrinth for game logic (fog, movement); cached
+        # layouts need no query, misses load on a DB worker thread
+        view = await self.get(session_id, db)
+        if view is None or view.details["labyrinth_id"] is None:
+            return None
+        labyrinth_id = UUID(view.details["labyrinth_id"])
+        record = labyrinth_cache.get_by_id(labyrinth_id)
+        if record is None:
+            record = await worker_pools.run_db(_load_labyrinth, labyrinth_id)
+        return record
+
+    async def client_joined(self, session_id: str, client_id: str, connected_at: datetime):
+        await self.backend.publish(f"lobby:{session_id}", {
+            "op": "join", "client_id": client_id, "connected_at": connected_at.isoformat()
+        })
+
+    async def client_left(self, session_id: str, client_id: str):
+        await self.backend.publish(f"lobby:{session_id}", {"op": "leave", "client_id": client_id})
+
+    async def sessions_deleted(self):
+        await self.backend.publish("lobby:*", {"op": "clear"})
+
+    async def _on_event(self, channel: str, message: dict):
+        if not channel.startswith("lobby:"):
+            return
+        self._generation += 1
+        self.events += 1
+        session_id = channel[len("lobby:"):]
+        if message["op"] == "clear":
+            self._views.clear()
+            return
+        view = self._views.get(session_id)
+        if view is None:
+            return
+        if message["op"] == "join":
+            view.clients[message["client_id"]] = message["connected_at"]
+        elif message["op"] == "leave":
+            view.clients.pop(message["client_id"], None)
+
+    def stats(self):
+        return {
+            "views": len(self._views),
+            "max_views": self.max_entries,
+            "hits": self.hits,
+            "loads": self.loads,
+            "events": self.events
+        }
+
+lobby_views = LobbyViews(session_backend, config.LOBBY_VIEW_CACHE_SIZE)
+session_backend.subscribe(lobby_views._on_event)
@@ -1,61 +1,106 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from datetime import datetime
-from sqlalchemy import create_engine
-from utils.corrected_labyrinth_backend_seed_fixed import generate_labyrinth
+from utils.labyrinth_cache import get_or_create_labyrinth
+from utils.labyrinth_pool import labyrinth_pool
+from utils.workers import WorkerQueueFull, worker_pools
+from utils.session_listing import session_page_query, split_page
+from utils import binary_frames
+from utils.labyrinth_payload import check_format, labyrinth_payloads
+from session_backend import session_backend
+from lobby_view import lobby_views
+from fog import fog_store
+from movement import movement_engine
+from ticks import tick_scheduler
+import asyncio
+import anyio
 from uuid import UUID
 import json
 import threading
-import pandas as pd
 
 from models.base import Base
 from models.game_session import GameSession
 from models.labyrinth import Labyrinth
 from models.player import Player
 from models.tile import Tile
-from models.game_entities import Base as EntityBase
-from db.init_data import load_data
 from db.session import get_db
+from db.engine import pool_metrics, request_checkouts
 
 from models.game_entities import Entity
 from models.equipment import Equipment
 from models.skills import Skill
 from models.specials import Special
-from state import session_readiness, lock
 
-from config import DATABASE_URL, init_db
+from config import BOOTSTRAP_ON_STARTUP, SESSION_LIST_DEFAULT_LIMIT, SESSION_LIST_MAX_LIMIT
 
 # Import API router
-from routes.api import router as api_router
+from routes.api import new_game_session, router as api_router
+from routes.labyrinths import router as labyrinths_router
+from routes.game import router as game_router
 
 # Import for real-time socket
 from realtime import mount_websocket_routes, broadcast_session_update
 
 app = FastAPI()
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
-
-FORCE_REINIT_DB = True
+@app.middleware("http")
+async def count_db_connections(request: Request, call_next):
+    # Connections checked out while serving this request (see /api/metrics/db_pool)
+    counter = [0]
+    token = request_checkouts.set(counter)
+    try:
+        return await call_next(request)
+    finally:
+        request_checkouts.reset(token)
+        pool_metrics.record_request(counter[0])
 
 @app.on_event("startup")
 def startup():
-    init_db()
+    # Schema and seed data are set up by `python -m bootstrap` before the
+    # workers start; booting a worker touches the database only if asked to
+    if BOOTSTRAP_ON_STARTUP:
+        from bootstrap import bootstrap
+        bootstrap()
+
+@app.on_event("startup")
+async def start_session_backend():
+    await session_backend.start()
+
+@app.on_event("shutdown")
+async def stop_session_backend():
+    await session_backend.stop()
+
+@app.on_event("startup")
+async def start_labyrinth_pool():
+    # Keep a reference so the refill task is not garbage collected; it waits
+    # for the first claim before touching the database
+    app.state.labyrinth_pool_task = asyncio.create_task(labyrinth_pool.run())
+
+# In-memory game state written back in batches (utils/write_behind.py)
+WRITE_BEHIND = [fog_store.writer, movement_engine.writer]
+
+@app.on_event("startup")
+async def start_write_behind():
+    app.state.write_behind_tasks = [asyncio.create_task(writer.run()) for writer in WRITE_BEHIND]
 
-    if FORCE_REINIT_DB:
-        print("⚠️ Reinitializing the database from scratch...")
-        EntityBase.metadata.drop_all(bind=engine)
-        EntityBase.metadata.create_all(bind=engine)
+@app.on_event("shutdown")
+async def stop_tick_loops():
+    # Before the final flush, so the last applied tick is written back
+    await tick_scheduler.stop()
 
-        df_entities = pd.read_csv("assets/seed/entities.csv")
-        df_equipment = pd.read_csv("assets/seed/equipment.csv")
-        df_skills = pd.read_csv("assets/seed/skills.csv")
-        df_specials = pd.read_csv("assets/seed/specials.csv")
+@app.on_event("shutdown")
+async def flush_write_behind():
+    for task in app.state.write_behind_tasks:
+        task.cancel()
+    for writer in WRITE_BEHIND:
+        await writer.flush()
 
-        load_data(engine, df_entities, df_equipment, df_skills, df_specials)
+@app.on_event("shutdown")
+def stop_worker_pools():
+    worker_pools.shutdown()
 
 class GameSessionCreateRequest(BaseModel):
     size: int
@@ -89,87 +134,75 @@ class LabyrinthResponse(BaseModel):
     start_y: int
     tiles: List[LabyrinthTile]
 
-def parse_directions(open_directions):
-    if isinstance(open_directions, str):
-        try:
-            return json.loads(open_directions)
-        except:
-            return [open_directions]
-    return open_directions
-
-def get_image_name(tile_type, directions):
-    directions = sorted(directions)
-    if tile_type == "crossroad":
-        return "tile_crossroad.png"
-    elif tile_type == "corridor":
-        return "tile_corridor_NS.png" if directions == ["N", "S"] else "tile_corridor_EW.png"
-    elif tile_type == "turn":
-        if directions == ["E", "N"]: return "tile_turn_NE.png"
-        elif directions == ["N", "W"]: return "tile_turn_NW.png"
-        elif directions == ["E", "S"]: return "tile_turn_SE.png"
-        elif directions == ["S", "W"]: return "tile_turn_SW.png"
-    elif tile_type == "t_section":
-        missing_direction = ({"N", "E", "S", "W"} - set(directions)).pop()
-        return f"tile_t_section_{missing_direction}.png"
-    elif tile_type == "dead_end":
-        return f"tile_dead_end_{directions[0]}.png"
-    return "tile_crossroad.png"
-
 @app.get("/game-sessions", response_model=List[GameSessionResponse])
-def list_game_sessions(db: Session = Depends(get_db)):
-    return db.query(GameSession).all()
+def list_game_sessions(
+    response: Response,
+    limit: int = Query(SESSION_LIST_DEFAULT_LIMIT, ge=1, le=SESSION_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    # Same keyset paging as /api/game_sessions; the next page's cursor is
+    # returned in X-Next-Cursor to keep the list response shape
+    try:
+        stmt = session_page_query(limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows, next_cursor = split_page(db.execute(stmt).all(), limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [session for session, _ in rows]
+
+def worker_busy(e: WorkerQueueFull, detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": str(e.retry_after)})
 
 @app.post("/create-game-session", response_model=GameSessionResponse)
-def create_game_session(request: GameSessionCreateRequest, db: Session = Depends(get_db)):
-    labyrinth, _ = generate_labyrinth(size=request.size, seed=request.seed, db=db)
-
-    game_session = GameSession(
-        seed=labyrinth.seed,
-        labyrinth_id=labyrinth.id,
-        start_x=labyrinth.start_x,
-        start_y=labyrinth.start_y
-    )
-    db.add(game_session)
-    db.commit()
-    db.refresh(game_session)
+async def create_game_session(request: GameSessionCreateRequest, db: Session = Depends(get_db)):
+    # Same bounded workers as /api/game_sessions/create (routes/api.py)
+    try:
+        return await worker_pools.run_db(new_game_session, request.size, request.seed, db)
+    except WorkerQueueFull as e:
+        raise worker_busy(e, "Session creation is busy, retry later")
+
+def labyrinth_response(request: GenerateLabyrinthRequest, http_request: Request, format: str,
+                       binary: bool, db: Session) -> Response:
+    # Runs on a DB worker thread; large boards are generated in a worker process
+    labyrinth = get_or_create_labyrinth(request.size, request.seed, db, generate=worker_pools.generate_masks)
+
+    # Opt-in compact layout: one direction-mask byte per cell (utils/binary_frames.py)
+    if binary:
+        return Response(
+            content=binary_frames.encode_layout(
+                labyrinth.size, labyrinth.start_x, labyrinth.start_y, labyrinth.seed, labyrinth.masks
+            ),
+            media_type=binary_frames.MEDIA_TYPE
+        )
 
-    return game_session
+    # Pre-serialized (and compressed) bytes, built once per labyrinth; "columnar"
+    # sends one mask digit per cell plus a 16-entry tile lookup table
+    return labyrinth_payloads.response(http_request, labyrinth, format)
 
 @app.post("/generate-labyrinth", response_model=LabyrinthResponse)
-def generate_labyrinth_visual(request: GenerateLabyrinthRequest, db: Session = Depends(get_db)):
-    labyrinth, tiles_response = generate_labyrinth(size=request.size, seed=request.seed, db=db)
-
-    tiles_data = []
-    for tile_info in tiles_response:
-        tile_db = db.query(Tile).filter(
-            Tile.labyrinth_id == labyrinth.id,
-            Tile.x == tile_info["x"],
-            Tile.y == tile_info["y"]
-        ).first()
-
-        directions = parse_directions(tile_db.open_directions)
-        image_name = get_image_name(tile_db.type, directions)
-
-        tile = LabyrinthTile(
-            x=tile_db.x,
-            y=tile_db.y,
-            type=tile_db.type,
-            open_directions=directions,
-            image=image_name
-        )
-        tiles_data.append(tile)
-
-    return LabyrinthResponse(
-        seed=labyrinth.seed,
-        start_x=labyrinth.start_x,
-        start_y=labyrinth.start_y,
-        tiles=tiles_data
-    )
+async def generate_labyrinth_visual(request: GenerateLabyrinthRequest, http_request: Request,
+                                    format: str = Query("tiles", pattern="^(tiles|columnar)$"),
+                                    db: Session = Depends(get_db)):
+    binary = binary_frames.accepts_binary(http_request.headers.get("accept"))
+    # Checked before generating: a large board in the tiles shape is tens of MB
+    if not binary:
+        try:
+            check_format(format, request.size)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        return await worker_pools.run_db(labyrinth_response, request, http_request, format, binary, db)
+    except WorkerQueueFull as e:
+        raise worker_busy(e, "Labyrinth generation is busy, retry later")
 
 @app.delete("/destroy-all-sessions")
 def destroy_all_sessions(db: Session = Depends(get_db)):
     db.query(GameSession).delete()
     db.commit()
+    # Cached lobby views in every worker describe sessions that are gone
+    anyio.from_thread.run(lobby_views.sessions_deleted)
     return {"detail": "All game sessions deleted"}
 
 # WebSocket endpoint registration FIRST
@@ -177,6 +210,8 @@ mount_websocket_routes(app)
 
 # Include API router SECOND
 app.include_router(api_router)
+app.include_router(labyrinths_router)
+app.include_router(game_router)
 
 # Mount static files LAST
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from .base import Base
+
+class FogReveal(Base):
+    # Reveal bitset (one bit per cell, utils.labyrinth_grid.new_bitset) of one
+    # client in a session; client_id "*" holds the session-wide union
+    __tablename__ = "fog_reveals"
+
+    game_session_id = Column(UUID(as_uuid=True), ForeignKey("game_sessions.id", ondelete="CASCADE"), primary_key=True)
+    client_id = Column(String(255), primary_key=True)
+    bits = Column(LargeBinary, nullable=False)
+    revealed_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
@@ -7,6 +7,10 @@ from .base import Base
 
 class GameSession(Base):
     __tablename__ = "game_sessions"
+    __table_args__ = (
+        # Keyset order of the session listing (utils/session_listing.py)
+        Index("ix_game_sessions_created_at_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     seed = Column(String(100), nullable=False)
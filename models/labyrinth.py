@@ -1,12 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, LargeBinary, SmallInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import NamedTuple, Tuple
 import uuid
 from .base import Base
+from utils.labyrinth_grid import (
+    MASK_DIRECTIONS,
+    MASK_TILE_TYPES,
+    bit_is_set,
+    unpack_masks,
+)
+
+class TileView(NamedTuple):
+    x: int
+    y: int
+    type: str
+    open_directions: Tuple[str, ...]
+    revealed: bool
 
 class Labyrinth(Base):
     __tablename__ = "labyrinths"
+    __table_args__ = (
+        # Layouts are deterministic in (size, seed): one stored labyrinth per pair
+        Index("ix_labyrinths_size_seed", "size", "seed", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     size = Column(Integer, nullable=False)
@@ -14,6 +32,16 @@ class Labyrinth(Base):
     start_x = Column(Integer, nullable=False)
     start_y = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Generated by utils.labyrinth_pool for random sessions; only these rows
+    # are put back in the pool after a restart. NULL on rows from older versions.
+    pooled = Column(Boolean, nullable=True)
+
+    # Packed storage: direction masks (see utils.labyrinth_grid.pack_masks)
+    # plus a bit per cell for the shared revealed flag. Labyrinths written
+    # before the packed format have layout = NULL and only Tile rows.
+    layout = Column(LargeBinary, nullable=True)
+    layout_format = Column(SmallInteger, nullable=True)
+    revealed_bits = Column(LargeBinary, nullable=True)
 
     game_sessions = relationship(
         "GameSession",
@@ -25,3 +53,25 @@ class Labyrinth(Base):
         back_populates="labyrinth",
         cascade="all, delete-orphan"
     )
+
+    @property
+    def masks(self) -> bytearray:
+        # Unpacked once per instance, on first access
+        masks = self.__dict__.get("_masks")
+        if masks is None:
+            if self.layout is None:
+                raise ValueError(f"Labyrinth {self.id} has no packed layout")
+            masks = unpack_masks(self.layout, self.size * self.size, self.layout_format)
+            self.__dict__["_masks"] = masks
+        return masks
+
+    def tile_view(self, x: int, y: int) -> TileView:
+        index = y * self.size + x
+        mask = self.masks[index]
+        revealed = bool(self.revealed_bits) and bit_is_set(self.revealed_bits, index)
+        return TileView(x, y, MASK_TILE_TYPES[mask], MASK_DIRECTIONS[mask], revealed)
+
+    def tile_views(self):
+        for y in range(self.size):
+            for x in range(self.size):
+                yield self.tile_view(x, y)
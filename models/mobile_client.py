@@ -11,6 +11,6 @@ class MobileClient(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     client_id = Column(String(255), unique=True, nullable=False)
     connected_at = Column(DateTime, default=datetime.utcnow)
-    game_session_id = Column(UUID(as_uuid=True), ForeignKey("game_sessions.id", ondelete="CASCADE"))
+    game_session_id = Column(UUID(as_uuid=True), ForeignKey("game_sessions.id", ondelete="CASCADE"), index=True)
 
     game_session = relationship("GameSession", back_populates="connected_clients")
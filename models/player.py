@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -6,9 +6,14 @@ from .base import Base
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        # One player row per joined client (movement.py)
+        Index("ix_players_session_client", "game_session_id", "client_id", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    game_session_id = Column(UUID(as_uuid=True), ForeignKey("game_sessions.id"), nullable=False)
+    game_session_id = Column(UUID(as_uuid=True), ForeignKey("game_sessions.id", ondelete="CASCADE"), nullable=False)
+    client_id = Column(String(255), nullable=True)
     player_x = Column(Integer, default=0, nullable=False)
     player_y = Column(Integer, default=0, nullable=False)
     username = Column(String(100), nullable=True)
@@ -0,0 +1,13 @@
+# models/seed_checksum.py
+from sqlalchemy import Column, String, Integer, DateTime
+from datetime import datetime
+from models.base import Base
+
+class SeedChecksum(Base):
+    # One row per CSV in assets/seed/: the digest it was last loaded with
+    __tablename__ = 'seed_checksums'
+
+    filename = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    loaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
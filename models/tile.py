@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from .base import Base
@@ -6,6 +6,10 @@ import uuid
 
 class Tile(Base):
     __tablename__ = "tiles"
+    __table_args__ = (
+        # Coordinate lookups: WHERE labyrinth_id = ? AND x = ? AND y = ?
+        Index("ix_tiles_labyrinth_xy", "labyrinth_id", "x", "y", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     labyrinth_id = Column(UUID(as_uuid=True), ForeignKey("labyrinths.id"), nullable=False)
@@ -0,0 +1,153 @@
+"""Authoritative player movement, held in memory per session.
+
+Positions live in this worker; a move is checked against the labyrinth's
+direction mask of the current cell (one byte lookup) and applied. Moves are
+queued and applied by the session's tick loop (ticks.py), which also reveals
+fog from the new cell and broadcasts the result once per tick.
+
+Players rows (one per client, created on first spawn) are written back by a
+write-behind batch every MOVEMENT_FLUSH_INTERVAL_SECONDS, which bounds what a
+crash can lose. As with fog, a session's game traffic must reach one worker.
+"""
+from typing import Dict, Optional, Tuple
+from uuid import UUID, uuid4
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from db.init_data import upsert_rows
+from lobby_view import lobby_views
+from models.player import Player
+from session_backend import session_backend
+from utils.labyrinth_grid import DIRECTION_BITS, DIRECTIONS
+from utils.write_behind import WriteBehind, existing_session_ids
+import config
+
+class MoveBlocked(ValueError):
+    """The move leaves the board or goes through a wall."""
+
+class PlayerPosition:
+    __slots__ = ("id", "x", "y")
+
+    def __init__(self, player_id: UUID, x: int, y: int):
+        self.id = player_id
+        self.x = x
+        self.y = y
+
+class SessionPositions:
+    def __init__(self, size: int, masks: bytes, start: Tuple[int, int]):
+        self.size = size
+        self.masks = masks
+        self.start = start
+        self.players: Dict[str, PlayerPosition] = {}
+
+    def step(self, player: PlayerPosition, direction: str) -> Tuple[int, int]:
+        bit = DIRECTION_BITS.get(direction)
+        if bit is None:
+            raise MoveBlocked(f"Unknown direction {direction!r}")
+        # The generator never opens a side facing off the board, so the mask
+        # check also keeps the player in bounds
+        if not self.masks[player.y * self.size + player.x] & bit:
+            raise MoveBlocked(f"Wall to the {direction} of ({player.x}, {player.y})")
+        dx, dy = DIRECTIONS[direction]
+        player.x += dx
+        player.y += dy
+        return player.x, player.y
+
+def _write_positions(db: Session, batch: dict):
+    existing = existing_session_ids(db, {row["session_id"] for row in batch.values()})
+    rows = [
+        {
+            "id": player_id,
+            "game_session_id": UUID(row["session_id"]),
+            "client_id": row["client_id"],
+            "player_x": row["x"],
+            "player_y": row["y"]
+        }
+        for player_id, row in batch.items()
+        if row["session_id"] in existing
+    ]
+    # Matched on (session, client): another worker may have stored this client
+    # under a different id
+    upsert_rows(db, Player, rows, conflict_columns=["game_session_id", "client_id"])
+    db.commit()
+
+class MovementEngine:
+    def __init__(self, writer: WriteBehind):
+        self.writer = writer
+        self._sessions: Dict[str, SessionPositions] = {}
+        self._loading: Dict[str, asyncio.Lock] = {}
+        self.moves = 0
+        self.blocked = 0
+
+    async def session(self, session_id: str, db: AsyncSession) -> Optional[SessionPositions]:
+        positions = self._sessions.get(session_id)
+        if positions is not None:
+            return positions
+        lock = self._loading.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                positions = self._sessions.get(session_id)
+                if positions is not None:
+                    return positions
+                record = await lobby_views.labyrinth(session_id, db)
+                if record is None:
+                    return None
+                view = await lobby_views.get(session_id, db)
+                positions = SessionPositions(
+                    record.size, record.masks, (view.details["start_x"], view.details["start_y"])
+                )
+                # Positions saved before a restart, all in one query
+                for player in await db.scalars(select(Player).where(Player.game_session_id == UUID(session_id))):
+                    if player.client_id is not None:
+                        positions.players[player.client_id] = PlayerPosition(player.id, player.player_x, player.player_y)
+                self._sessions[session_id] = positions
+                return positions
+        finally:
+            # As in fog.py: also on a miss or a failed load
+            self._loading.pop(session_id, None)
+
+    def _record(self, session_id: str, client_id: str, player: PlayerPosition):
+        self.writer.mark(player.id, {"session_id": session_id, "client_id": client_id, "x": player.x, "y": player.y})
+
+    def spawn(self, session_id: str, client_id: str) -> Tuple[PlayerPosition, bool]:
+        # -> (position, whether it was just created). A client without a
+        # position starts on the labyrinth's start cell.
+        positions = self._sessions[session_id]
+        player = positions.players.get(client_id)
+        if player is not None:
+            return player, False
+        player = positions.players[client_id] = PlayerPosition(uuid4(), *positions.start)
+        self._record(session_id, client_id, player)
+        return player, True
+
+    def move(self, session_id: str, client_id: str, direction: str) -> PlayerPosition:
+        """Move one cell in a session loaded with session(); raises MoveBlocked
+        for walls and unknown directions."""
+        player, _ = self.spawn(session_id, client_id)
+        try:
+            self._sessions[session_id].step(player, direction)
+        except MoveBlocked:
+            self.blocked += 1
+            raise
+        self.moves += 1
+        self._record(session_id, client_id, player)
+        return player
+
+    async def _on_event(self, channel: str, message: dict):
+        if channel == "lobby:*" and message.get("op") == "clear":
+            self._sessions.clear()
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "players": sum(len(p.players) for p in self._sessions.values()),
+            "moves": self.moves,
+            "blocked": self.blocked,
+            "write_behind": self.writer.stats()
+        }
+
+movement_engine = MovementEngine(
+    WriteBehind("positions", _write_positions, config.MOVEMENT_FLUSH_INTERVAL_SECONDS, config.MOVEMENT_FLUSH_MAX_PENDING)
+)
+session_backend.subscribe(movement_engine._on_event)
@@ -1,29 +1,192 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional
 import asyncio
+import json
+import logging
+from session_backend import session_backend
+from utils import binary_frames
+import config
 
-# Each session_id maps to a list of WebSocket connections
-active_connections: Dict[str, List[WebSocket]] = {}
+logger = logging.getLogger(__name__)
 
-async def connect_to_session(session_id: str, websocket: WebSocket):
-    await websocket.accept()
-    if session_id not in active_connections:
-        active_connections[session_id] = []
-    active_connections[session_id].append(websocket)
-
-async def disconnect_from_session(session_id: str, websocket: WebSocket):
-    if session_id in active_connections:
-        active_connections[session_id].remove(websocket)
-        if not active_connections[session_id]:
-            del active_connections[session_id]
-
-async def broadcast_session_update(session_id: str, message: dict):
-    if session_id in active_connections:
-        for connection in active_connections[session_id]:
+class SessionConnection:
+    """One WebSocket plus its bounded outgoing queue and writer task.
+
+    Broadcasts only enqueue; the writer task drains the queue, so a slow phone
+    delays nobody but itself. A full queue marks the connection as a slow
+    consumer and it is evicted.
+    """
+
+    def __init__(self, session_id: str, websocket: WebSocket, max_queue: int, protocol: str = "full",
+                 encoding: str = "json"):
+        self.session_id = session_id
+        self.websocket = websocket
+        # "full": every lobby update is a complete SessionStatus (original format)
+        # "delta": versioned snapshot/delta frames, see lobby.py
+        self.protocol = protocol
+        # "json": text frames; "binary": utils/binary_frames.py where the frame has a binary form
+        self.encoding = encoding
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def start(self):
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message) -> bool:
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _writer(self):
+        while True:
+            message = await self.queue.get()
+            if isinstance(message, bytes):
+                send = self.websocket.send_bytes(message)
+            else:
+                send = self.websocket.send_json(message)
             try:
-                await connection.send_json(message)
+                await asyncio.wait_for(send, timeout=config.REALTIME_SEND_TIMEOUT_SECONDS)
+                metrics["messages_sent"] += 1
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                pass  # Ignore failed sends
+                metrics["failed_sends"] += 1
+                _prune(self, reason="send failed")
+                return
+
+    async def close(self, code: int):
+        self.closed = True
+        if self.writer_task is not None and self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # Already closed by the peer
+
+# Each session_id maps to the connections currently subscribed to it
+active_connections: Dict[str, List[SessionConnection]] = {}
+
+# Hooks registered by feature modules (lobby.py, ...): called with the new
+# connection after it joins, and per incoming JSON message by its "type"
+ConnectionHandler = Callable[[SessionConnection], Awaitable[None]]
+MessageHandler = Callable[[SessionConnection, dict], Awaitable[None]]
+connect_handlers: List[ConnectionHandler] = []
+message_handlers: Dict[str, MessageHandler] = {}
+
+metrics = {
+    "messages_enqueued": 0,
+    "messages_sent": 0,
+    "messages_dropped": 0,
+    "failed_sends": 0,
+    "slow_consumer_evictions": 0,
+    "pruned_connections": 0,
+    "binary_frames_encoded": 0
+}
+
+def _remove(connection: SessionConnection) -> bool:
+    connections = active_connections.get(connection.session_id)
+    if not connections or connection not in connections:
+        return False
+    connections.remove(connection)
+    if not connections:
+        del active_connections[connection.session_id]
+    return True
+
+def _prune(connection: SessionConnection, reason: str, code: int = 1011):
+    # Drop a connection from fan-out immediately; the socket is closed in the background
+    if _remove(connection):
+        metrics["pruned_connections"] += 1
+        logger.info("Pruned WebSocket in session %s: %s", connection.session_id, reason)
+    connection.closed = True
+    asyncio.create_task(connection.close(code))
+
+async def connect_to_session(session_id: str, websocket: WebSocket) -> SessionConnection:
+    await websocket.accept()
+    protocol = "delta" if websocket.query_params.get("protocol") == "delta" else "full"
+    binary = (websocket.query_params.get("encoding") == "binary"
+              or binary_frames.accepts_binary(websocket.headers.get("accept")))
+    connection = SessionConnection(
+        session_id, websocket, config.REALTIME_SEND_QUEUE_SIZE, protocol, "binary" if binary else "json"
+    )
+    connection.start()
+    active_connections.setdefault(session_id, []).append(connection)
+    for handler in connect_handlers:
+        await handler(connection)
+    return connection
+
+async def disconnect_from_session(session_id: str, connection: SessionConnection):
+    _remove(connection)
+    connection.closed = True
+    if connection.writer_task is not None:
+        connection.writer_task.cancel()
+
+def encode_for(connection: SessionConnection, message: dict, encoded: Dict[int, Optional[bytes]]):
+    # What goes on this connection's queue; binary frames are encoded once
+    # per message and shared by every binary connection (encoded: id -> frame)
+    if connection.encoding != "binary":
+        return message
+    key = id(message)
+    if key not in encoded:
+        encoded[key] = binary_frames.encode_frame(message)
+        metrics["binary_frames_encoded"] += 1
+    return encoded[key] if encoded[key] is not None else message
+
+def send_to_connection(connection: SessionConnection, message: dict, encoded: Optional[dict] = None):
+    message = encode_for(connection, message, {} if encoded is None else encoded)
+    if connection.enqueue(message):
+        metrics["messages_enqueued"] += 1
+    elif not connection.closed:
+        metrics["messages_dropped"] += 1
+        metrics["slow_consumer_evictions"] += 1
+        _prune(connection, reason="send queue full", code=1013)
+
+async def broadcast_session_update(session_id: str, message: dict, delta_message: Optional[dict] = None):
+    # Published through the session backend so every worker with sockets in
+    # this session delivers it (see _deliver_local)
+    await session_backend.publish(f"session:{session_id}", {"message": message, "delta": delta_message})
+
+async def _deliver_local(channel: str, payload: dict):
+    # Enqueue-only fan-out: never awaits a socket, so one slow or dead client
+    # cannot hold up the rest of the session. Connections that negotiated the
+    # delta protocol get the delta message when one is given.
+    if not channel.startswith("session:"):
+        return
+    session_id = channel[len("session:"):]
+    message, delta_message = payload["message"], payload.get("delta")
+    encoded = {}
+    for connection in list(active_connections.get(session_id, ())):
+        if delta_message is not None and connection.protocol == "delta":
+            send_to_connection(connection, delta_message, encoded)
+        else:
+            send_to_connection(connection, message, encoded)
+
+session_backend.subscribe(_deliver_local)
+
+async def handle_client_message(connection: SessionConnection, text: str):
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return  # Plain keep-alive text
+    if isinstance(message, dict):
+        handler = message_handlers.get(message.get("type"))
+        if handler is not None:
+            await handler(connection, message)
+
+def get_metrics():
+    depths = [c.queue.qsize() for connections in active_connections.values() for c in connections]
+    return {
+        **metrics,
+        "sessions": len(active_connections),
+        "connections": len(depths),
+        "queue_depth_total": sum(depths),
+        "queue_depth_max": max(depths, default=0),
+        "queue_capacity": config.REALTIME_SEND_QUEUE_SIZE
+    }
 
 # WebSocket endpoint to include in main FastAPI app
 def mount_websocket_routes(app):
@@ -33,12 +196,26 @@ def mount_websocket_routes(app):
 
     @router.websocket("/ws/{session_id}")
     async def websocket_endpoint(websocket: WebSocket, session_id: str):
-        await connect_to_session(session_id, websocket)
+        connection = await connect_to_session(session_id, websocket)
         try:
             while True:
-                await websocket.receive_text()  # Just keep alive
-        except WebSocketDisconnect:
-            await disconnect_from_session(session_id, websocket)
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                text = message.get("text")
+                if text is None:
+                    # Clients on the binary encoding may send their JSON messages
+                    # as bytes; there are no binary client-to-server frames
+                    try:
+                        text = (message.get("bytes") or b"").decode()
+                    except UnicodeDecodeError:
+                        await websocket.close(code=1003)
+                        break
+                await handle_client_message(connection, text)
+        except (WebSocketDisconnect, RuntimeError):
+            # RuntimeError: the socket was closed server-side (slow consumer / failed send)
+            pass
+        finally:
+            await disconnect_from_session(session_id, connection)
 
     app.include_router(router)
-
@@ -1,91 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from models.game_session import GameSession
 from models.mobile_client import MobileClient
+from typing import Literal, Optional
 from uuid import UUID, uuid4
 from datetime import datetime
 from schemas import ClientJoinRequest, GameSessionCreateRequest, PlayerStatus, SessionStatus
 from db.session import get_db
-from utils.corrected_labyrinth_backend_seed_fixed import generate_labyrinth
-from state import session_readiness, lock
-from realtime import broadcast_session_update
+from db.async_session import get_async_db
+from db.engine import get_pool_stats
+from utils.labyrinth_cache import get_or_create_labyrinth, labyrinth_cache
+from utils.labyrinth_pool import labyrinth_pool
+from utils.workers import WorkerQueueFull, worker_pools
+from state import ReadinessSnapshot
+from session_backend import session_backend
+from realtime import get_metrics as get_realtime_stats
+from lobby import lobby_broadcaster
+from lobby_view import lobby_views, session_details
+from utils.http_cache import conditional_json
+from utils.session_listing import session_page_query, session_summary, split_page
+import config
 
 router = APIRouter()
 
+def session_status_from(snapshot: ReadinessSnapshot) -> SessionStatus:
+    return SessionStatus(
+        players=[PlayerStatus(client_id=cid, ready=ready) for cid, ready in snapshot.players.items()],
+        all_ready=snapshot.all_ready,
+        version=snapshot.version
+    )
+
+# Lobby routes run on the event loop that also serves /ws/{session_id}, so
+# they use the async session (db/async_session.py) rather than blocking it.
+
 @router.get('/api/game_sessions')
-async def get_game_sessions(db: Session = Depends(get_db)):
-    sessions = db.query(GameSession).all()
-    return {"sessions": sessions}
+async def get_game_sessions(
+    request: Request,
+    limit: int = Query(config.SESSION_LIST_DEFAULT_LIMIT, ge=1, le=config.SESSION_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    size: Optional[int] = None,
+    status: Optional[Literal["open", "full"]] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Newest first; pass next_cursor back as ?cursor= for the following page
+    try:
+        stmt = session_page_query(limit, cursor, size, status)
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+    rows, next_cursor = split_page((await db.execute(stmt)).all(), limit)
+    return conditional_json(request, {
+        "sessions": [session_summary(session, count) for session, count in rows],
+        "next_cursor": next_cursor
+    })
 
 @router.post('/api/game_sessions/{session_id}/join')
-async def join_game_session(session_id: UUID, request: ClientJoinRequest, db: Session = Depends(get_db)):
-    session = db.query(GameSession).filter(GameSession.id == session_id).first()
-    if not session:
+async def join_game_session(session_id: UUID, request: ClientJoinRequest, db: AsyncSession = Depends(get_async_db)):
+    session_str_id = str(session_id)
+    view = await lobby_views.get(session_str_id, db)
+    if not view:
         raise HTTPException(status_code=404, detail='Session not found')
 
-    existing_client = db.query(MobileClient).filter(MobileClient.client_id == request.client_id).first()
+    existing_client = await db.scalar(select(MobileClient).where(MobileClient.client_id == request.client_id))
     if existing_client:
         return {'message': 'Client already connected'}
 
     new_client = MobileClient(
         client_id=request.client_id,
-        game_session_id=session.id,
+        game_session_id=session_id,
         connected_at=datetime.utcnow()
     )
     db.add(new_client)
-    db.commit()
-    db.refresh(new_client)
-
-    # Explicitly register client in readiness tracking upon joining
-    with lock:
-        session_str_id = str(session_id)
-        if session_str_id not in session_readiness:
-            session_readiness[session_str_id] = {}
-
-        session_readiness[session_str_id][request.client_id] = False
+    await db.commit()
 
-        # Immediately broadcast updated readiness state
-        players = [
-            PlayerStatus(client_id=cid, ready=ready)
-            for cid, ready in session_readiness[session_str_id].items()
-        ]
-        session_status = SessionStatus(players=players, all_ready=False)
-        await broadcast_session_update(session_str_id, session_status.dict())  # <-- fix: added await explicitly
+    # Explicitly register client in readiness tracking upon joining; the
+    # committed change is broadcast (coalesced) outside the session lock
+    await lobby_views.client_joined(session_str_id, request.client_id, new_client.connected_at)
+    await session_backend.add_client(session_str_id, request.client_id)
+    lobby_broadcaster.notify(session_str_id)
 
+    details = view.details
     return {
         'message': 'Connected successfully',
-        'session_id': str(session.id),
-        'map_seed': session.seed,
-        'labyrinth_id': str(session.labyrinth_id),
-        'start_x': session.start_x,
-        'start_y': session.start_y,
-        'size': session.size
+        'session_id': details['session_id'],
+        'map_seed': details['seed'],
+        'labyrinth_id': details['labyrinth_id'],
+        'start_x': details['start_x'],
+        'start_y': details['start_y'],
+        'size': details['size']
     }
 
 @router.get('/api/game_sessions/{session_id}/clients')
-async def get_connected_clients(session_id: UUID, db: Session = Depends(get_db)):
-    session = db.query(GameSession).filter(GameSession.id == session_id).first()
-    if not session:
+async def get_connected_clients(session_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    view = await lobby_views.get(str(session_id), db)
+    if not view:
         raise HTTPException(status_code=404, detail='Session not found')
 
     return {
         'clients': [
-            {
-                'client_id': client.client_id,
-                'connected_at': client.connected_at.isoformat()
-            } for client in session.connected_clients
+            {'client_id': client_id, 'connected_at': connected_at}
+            for client_id, connected_at in view.clients.items()
         ]
     }
 
-@router.post('/api/game_sessions/create')
-async def create_game_session(request: GameSessionCreateRequest, db: Session = Depends(get_db)):
-    labyrinth, _ = generate_labyrinth(request.size, None, db)
+@router.get('/api/game_sessions/{session_id}/lobby')
+async def get_lobby(session_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    # Session details, clients with readiness, and the readiness version
+    payload = await lobby_views.payload(str(session_id), db)
+    if payload is None:
+        raise HTTPException(status_code=404, detail='Session not found')
+    return payload
+
+def new_game_session(size: int, seed, db: Session) -> GameSession:
+    # Runs on a DB worker thread (also for main.py's /create-game-session);
+    # large boards are generated in a worker process
+    generate = worker_pools.generate_masks
+
+    # A client-supplied seed goes through the (size, seed) cache; otherwise
+    # claim a pre-generated labyrinth so generation stays off the request path
+    if seed:
+        labyrinth = get_or_create_labyrinth(size, seed, db, generate=generate)
+    else:
+        labyrinth = labyrinth_pool.acquire(size, db, generate=generate)
 
     new_session = GameSession(
         id=uuid4(),
         seed=labyrinth.seed,
         labyrinth_id=labyrinth.id,
-        size=request.size,
+        size=size,
         start_x=labyrinth.start_x,
         start_y=labyrinth.start_y,
         created_at=datetime.utcnow()
@@ -93,6 +136,18 @@ async def create_game_session(request: GameSessionCreateRequest, db: Session = D
     db.add(new_session)
     db.commit()
     db.refresh(new_session)
+    return new_session
+
+@router.post('/api/game_sessions/create')
+async def create_game_session(request: GameSessionCreateRequest, db: Session = Depends(get_db)):
+    try:
+        new_session = await worker_pools.run_db(new_game_session, request.size, request.seed, db)
+    except WorkerQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail='Session creation is busy, retry later',
+            headers={'Retry-After': str(e.retry_after)}
+        )
 
     return {
         'message': 'Game session created successfully',
@@ -105,63 +160,63 @@ async def create_game_session(request: GameSessionCreateRequest, db: Session = D
     }
 
 @router.post('/api/game_sessions/leave')
-async def leave_game_session(request: ClientJoinRequest, db: Session = Depends(get_db)):
-    existing_client = db.query(MobileClient).filter(MobileClient.client_id == request.client_id).first()
+async def leave_game_session(request: ClientJoinRequest, db: AsyncSession = Depends(get_async_db)):
+    existing_client = await db.scalar(select(MobileClient).where(MobileClient.client_id == request.client_id))
     if not existing_client:
         raise HTTPException(status_code=404, detail='Client not connected to any session')
 
-    db.delete(existing_client)
-    db.commit()
+    session_str_id = str(existing_client.game_session_id)
+    await db.delete(existing_client)
+    await db.commit()
+
+    await lobby_views.client_left(session_str_id, request.client_id)
+    await session_backend.remove_client(session_str_id, request.client_id)
+    lobby_broadcaster.notify(session_str_id)
 
     return {'message': 'Disconnected successfully'}
 
 @router.get("/api/game_sessions/client_state/{client_id}")
-async def get_client_state(client_id: str, db: Session = Depends(get_db)):
-    client = db.query(MobileClient).filter(MobileClient.client_id == client_id).first()
-    if client and client.game_session_id:
-        session = db.query(GameSession).filter(GameSession.id == client.game_session_id).first()
-        if session:
-            return {
-                "client_id": client_id,
-                "connected_session": str(session.id),
-                "session_details": {
-                    "session_id": str(session.id),
-                    "labyrinth_id": str(session.labyrinth_id),
-                    "seed": session.seed,
-                    "size": session.size,
-                    "start_x": session.start_x,
-                    "start_y": session.start_y
-                }
-            }
+async def get_client_state(client_id: str, db: AsyncSession = Depends(get_async_db)):
+    # One query: the client's row joined to its session
+    session = await db.scalar(
+        select(GameSession)
+        .join(MobileClient, MobileClient.game_session_id == GameSession.id)
+        .where(MobileClient.client_id == client_id)
+    )
+    if session:
+        return {
+            "client_id": client_id,
+            "connected_session": str(session.id),
+            "session_details": session_details(session)
+        }
     return {"client_id": client_id, "connected_session": None, "session_details": None}
 
 @router.post("/api/game_sessions/{session_id}/toggle_readiness", response_model=SessionStatus)
 async def toggle_readiness(session_id: str, payload: PlayerStatus):
-    with lock:
-        if session_id not in session_readiness:
-            session_readiness[session_id] = {}
+    snapshot = await session_backend.set_ready(session_id, payload.client_id, payload.ready)
+    lobby_broadcaster.notify(session_id)
+    return session_status_from(snapshot)
 
-        session_readiness[session_id][payload.client_id] = payload.ready
+@router.get("/api/game_sessions/{session_id}/status", response_model=SessionStatus)
+async def get_session_status(session_id: str):
+    return session_status_from(await session_backend.snapshot(session_id))
 
-        players = [
-            PlayerStatus(client_id=cid, ready=ready)
-            for cid, ready in session_readiness[session_id].items()
-        ]
-        all_ready = all(p.ready for p in players)
-        session_status = SessionStatus(players=players, all_ready=all_ready)
+@router.get("/api/metrics/labyrinth_cache")
+async def get_labyrinth_cache_metrics():
+    return labyrinth_cache.stats()
 
-        await broadcast_session_update(session_id, session_status.dict())  # <-- fix: added await explicitly
+@router.get("/api/metrics/labyrinth_pool")
+async def get_labyrinth_pool_metrics():
+    return labyrinth_pool.stats()
 
-        return session_status
+@router.get("/api/metrics/workers")
+async def get_worker_metrics():
+    return worker_pools.stats()
 
-@router.get("/api/game_sessions/{session_id}/status", response_model=SessionStatus)
-async def get_session_status(session_id: str):
-    with lock:
-        players = []
-        if session_id in session_readiness:
-            players = [
-                PlayerStatus(client_id=cid, ready=ready)
-                for cid, ready in session_readiness[session_id].items()
-            ]
-        all_ready = all(p.ready for p in players) if players else False
-        return SessionStatus(players=players, all_ready=all_ready)
+@router.get("/api/metrics/realtime")
+async def get_realtime_metrics():
+    return {**get_realtime_stats(), "lobby": lobby_broadcaster.stats(), "lobby_views": lobby_views.stats()}
+
+@router.get("/api/metrics/db_pool")
+async def get_db_pool_metrics():
+    return get_pool_stats()
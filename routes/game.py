@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+import base64
+from schemas import MoveRequest, RevealRequest
+from db.async_session import get_async_db
+from fog import SESSION_KEY, fog_store, revealed_count
+from lobby_view import LobbyView, lobby_views
+from movement import MoveBlocked, movement_engine
+from ticks import tick_scheduler
+from utils.workers import WorkerQueueFull
+
+router = APIRouter()
+
+# In-game routes: state is in memory (fog.py, movement.py), so they run on the event loop
+# and only touch the database when a session is first loaded. Moves and reveals are
+# queued on the session's tick loop (ticks.py) and answered once their tick ran.
+
+def worker_busy(e: WorkerQueueFull) -> HTTPException:
+    # Loading a session's labyrinth goes through the bounded DB workers (lobby_view.py)
+    return HTTPException(status_code=503, detail='Session loading is busy, retry later',
+                         headers={'Retry-After': str(e.retry_after)})
+
+async def get_joined_view(session_id: UUID, client_id: str, db: AsyncSession) -> LobbyView:
+    view = await lobby_views.get(str(session_id), db)
+    if not view:
+        raise HTTPException(status_code=404, detail='Session not found')
+    if client_id not in view.clients:
+        raise HTTPException(status_code=403, detail='Client has not joined this session')
+    return view
+
+@router.post("/api/game_sessions/{session_id}/reveal")
+async def reveal_cells(session_id: UUID, request: RevealRequest, db: AsyncSession = Depends(get_async_db)):
+    # Reveals around the player's current cell (movement.py), wherever the client thinks it is
+    await get_joined_view(session_id, request.client_id, db)
+    try:
+        cells = await tick_scheduler.submit(
+            str(session_id), request.client_id, "reveal", (), db
+        )
+    except WorkerQueueFull as e:
+        raise worker_busy(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cells is None:
+        raise HTTPException(status_code=404, detail='Session has no labyrinth')
+    # Same [x, y, mask] cells as in the "tick" WebSocket frame
+    return {"cells": cells}
+
+@router.get("/api/game_sessions/{session_id}/fog")
+async def get_fog(session_id: UUID, client_id: str = SESSION_KEY, db: AsyncSession = Depends(get_async_db)):
+    # One client's bitset, or the session-wide union by default: bit i (LSB
+    # first within each byte) is cell (i % size, i // size)
+    try:
+        fog = await fog_store.session(str(session_id), db)
+    except WorkerQueueFull as e:
+        raise worker_busy(e)
+    if fog is None:
+        raise HTTPException(status_code=404, detail='Session not found')
+    bits = fog.bits.get(client_id) or bytes(len(fog.bits[SESSION_KEY]))
+    return {
+        "size": fog.size,
+        "client_id": client_id,
+        "revealed": revealed_count(bits),
+        "bits": base64.b64encode(bits).decode()
+    }
+
+@router.post("/api/game_sessions/{session_id}/move")
+async def move_player(session_id: UUID, request: MoveRequest, db: AsyncSession = Depends(get_async_db)):
+    await get_joined_view(session_id, request.client_id, db)
+    try:
+        player = await tick_scheduler.submit(
+            str(session_id), request.client_id, "move", (request.direction,), db
+        )
+    except WorkerQueueFull as e:
+        raise worker_busy(e)
+    except MoveBlocked as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if player is None:
+        raise HTTPException(status_code=404, detail='Session has no labyrinth')
+    return {"client_id": request.client_id, "x": player.x, "y": player.y}
+
+@router.get("/api/game_sessions/{session_id}/positions")
+async def get_positions(session_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    try:
+        positions = await movement_engine.session(str(session_id), db)
+    except WorkerQueueFull as e:
+        raise worker_busy(e)
+    if positions is None:
+        raise HTTPException(status_code=404, detail='Session not found')
+    return {
+        "positions": [
+            {"client_id": client_id, "x": player.x, "y": player.y}
+            for client_id, player in positions.players.items()
+        ]
+    }
+
+@router.get("/api/metrics/fog")
+async def get_fog_metrics():
+    return fog_store.stats()
+
+@router.get("/api/metrics/movement")
+async def get_movement_metrics():
+    return movement_engine.stats()
+
+@router.get("/api/metrics/ticks")
+async def get_tick_metrics():
+    return tick_scheduler.stats()
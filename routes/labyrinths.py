@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from uuid import UUID
+import os
+from db.session import get_db
+from utils.labyrinth_cache import LabyrinthRecord, load_labyrinth
+from utils.labyrinth_payload import check_format, labyrinth_payloads, region_payload, stream_rows
+from utils.map_render import map_cache
+from utils.navigation import Navigator, first_step, navigator_for, navigators
+import config
+
+router = APIRouter()
+
+def parse_cells(value: str) -> List[Tuple[int, int]]:
+    # "x,y;x,y;..." -> [(x, y), ...]
+    try:
+        return [tuple(int(v) for v in cell.split(",", 1)) for cell in value.split(";") if cell]
+    except ValueError:
+        raise HTTPException(status_code=400, detail='Cells must be given as "x,y;x,y"')
+
+def get_record(labyrinth_id: UUID, db: Session) -> LabyrinthRecord:
+    # Sync routes: a cached labyrinth needs no DB access, a miss is one lookup
+    record = load_labyrinth(labyrinth_id, db)
+    if record is None:
+        raise HTTPException(status_code=404, detail='Labyrinth not found')
+    return record
+
+def get_navigator(labyrinth_id: UUID, db: Session) -> Navigator:
+    return navigator_for(get_record(labyrinth_id, db))
+
+@router.get("/api/labyrinths/{labyrinth_id}/layout")
+def get_layout(labyrinth_id: UUID, request: Request,
+               format: str = Query("columnar", pattern="^(tiles|columnar)$"),
+               db: Session = Depends(get_db)):
+    record = get_record(labyrinth_id, db)
+    try:
+        check_format(format, record.size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return labyrinth_payloads.response(request, record, format)
+
+@router.get("/api/labyrinths/{labyrinth_id}/region")
+def get_region(labyrinth_id: UUID,
+               x: Optional[int] = None, y: Optional[int] = None,
+               width: Optional[int] = Query(None, ge=1), height: Optional[int] = Query(None, ge=1),
+               cx: Optional[int] = None, cy: Optional[int] = None, radius: Optional[int] = Query(None, ge=0),
+               db: Session = Depends(get_db)):
+    # A rectangle (x, y, width, height) or the square of cells within radius
+    # steps of (cx, cy) on each axis; either is clipped to the board
+    if None not in (cx, cy, radius):
+        x, y, width, height = cx - radius, cy - radius, 2 * radius + 1, 2 * radius + 1
+    elif None in (x, y, width, height):
+        raise HTTPException(status_code=400, detail='Give x, y, width and height, or cx, cy and radius')
+    if width * height > config.REGION_MAX_CELLS:
+        raise HTTPException(status_code=400, detail=f'Regions are limited to {config.REGION_MAX_CELLS} cells')
+    record = get_record(labyrinth_id, db)
+    try:
+        return region_payload(record, x, y, width, height)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/api/labyrinths/{labyrinth_id}/stream")
+def stream_layout(labyrinth_id: UUID,
+                  rows_per_chunk: int = Query(config.STREAM_ROWS_PER_CHUNK, ge=1, le=1000),
+                  db: Session = Depends(get_db)):
+    # The whole board as NDJSON, one band of rows per line, for clients that
+    # render progressively instead of waiting for one large body
+    record = get_record(labyrinth_id, db)
+    return StreamingResponse(stream_rows(record, rows_per_chunk), media_type="application/x-ndjson")
+
+@router.get("/api/labyrinths/{labyrinth_id}/map.png")
+def get_map_image(labyrinth_id: UUID, request: Request,
+                  tile_px: int = Query(config.MAP_DEFAULT_TILE_PX, description=f"Pixels per tile, one of {config.MAP_TILE_PX_SIZES}"),
+                  db: Session = Depends(get_db)):
+    # The whole labyrinth as one image instead of one <img> per tile
+    record = get_record(labyrinth_id, db)
+    try:
+        path = map_cache.path(record, tile_px)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The file name already hashes everything the image depends on
+    etag = '"' + os.path.basename(path)[:-len(".png")] + '"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/png", headers=headers)
+
+@router.get("/api/maps/options")
+def get_map_options():
+    return map_cache.options()
+
+@router.get("/api/labyrinths/{labyrinth_id}/path")
+def get_shortest_path(labyrinth_id: UUID, from_x: int, from_y: int, to_x: int, to_y: int,
+                      db: Session = Depends(get_db)):
+    navigator = get_navigator(labyrinth_id, db)
+    try:
+        path = navigator.shortest_path((from_x, from_y), (to_x, to_y))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "distance": len(path) - 1 if path else -1,
+        "next_step": first_step(path),
+        "path": path
+    }
+
+@router.get("/api/labyrinths/{labyrinth_id}/nearest")
+def get_nearest_target(labyrinth_id: UUID, from_x: int, from_y: int,
+                       targets: str = Query(..., description='Candidate cells as "x,y;x,y"'),
+                       db: Session = Depends(get_db)):
+    navigator = get_navigator(labyrinth_id, db)
+    try:
+        target, distance, path = navigator.nearest((from_x, from_y), parse_cells(targets))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "target": target,
+        "distance": distance,
+        "next_step": first_step(path),
+        "path": path
+    }
+
+@router.get("/api/metrics/navigation")
+def get_navigation_metrics():
+    return navigators.stats()
+
+@router.get("/api/metrics/labyrinth_payloads")
+def get_labyrinth_payload_metrics():
+    return labyrinth_payloads.stats()
+
+@router.get("/api/metrics/maps")
+def get_map_metrics():
+    return map_cache.stats()
@@ -4,6 +4,15 @@ from typing import Optional
 class ClientJoinRequest(BaseModel):
     client_id: str
 
+class RevealRequest(BaseModel):
+    # Fog is revealed from the player's server-side position; a client-sent
+    # x / y from older clients is ignored
+    client_id: str
+
+class MoveRequest(BaseModel):
+    client_id: str
+    direction: str  # "N", "E", "S" or "W"
+
 class GameSessionCreateRequest(BaseModel):
     size: int                  # Explicitly required
     seed: Optional[str] = None  # Optional seed parameter added
@@ -18,3 +27,4 @@ class PlayerStatus(BaseModel):
 class SessionStatus(BaseModel):
     players: List[PlayerStatus]
     all_ready: bool
+    version: int = 0
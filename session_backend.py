@@ -0,0 +1,281 @@
+"""Shared session state and pub/sub for one or more app workers.
+
+Readiness state and WebSocket broadcasts go through a SessionBackend so that
+players of the same session can be served by different uvicorn/gunicorn
+workers:
+
+* InProcessBackend - state in this process, publish delivers locally. The
+  default, and all a single-worker deployment needs.
+* UnixSocketBackend - workers on one host share state through a hub on a Unix
+  socket. The worker holding the lock on config.SESSION_BACKEND_SOCKET hosts
+  the hub; every worker (the host included) connects to it as a client, and
+  published messages are fanned out to all of them. If the hosting worker
+  exits, the others reconnect and one of them takes over as a fresh hub; state
+  held by the old hub is lost, and lobbies rebuild it as players re-join or toggle.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import itertools
+import json
+import logging
+import fcntl
+import os
+from state import ReadinessSnapshot, ReadinessStore
+import config
+
+logger = logging.getLogger(__name__)
+
+Subscriber = Callable[[str, dict], Awaitable[None]]
+
+class SessionBackend:
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, handler: Subscriber):
+        # handler(channel, message) runs in every worker for every published message
+        self._subscribers.append(handler)
+
+    async def _deliver(self, channel: str, message: dict):
+        for handler in self._subscribers:
+            try:
+                await handler(channel, message)
+            except Exception:
+                logger.exception("Subscriber failed for channel %s", channel)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, channel: str, message: dict):
+        raise NotImplementedError
+
+    async def set_ready(self, session_id: str, client_id: str, ready: bool) -> ReadinessSnapshot:
+        raise NotImplementedError
+
+    async def add_client(self, session_id: str, client_id: str) -> ReadinessSnapshot:
+        return await self.set_ready(session_id, client_id, False)
+
+    async def remove_client(self, session_id: str, client_id: str) -> ReadinessSnapshot:
+        raise NotImplementedError
+
+    async def snapshot(self, session_id: str) -> ReadinessSnapshot:
+        raise NotImplementedError
+
+    async def claim_changes(self, session_id: str):
+        raise NotImplementedError
+
+class InProcessBackend(SessionBackend):
+    def __init__(self):
+        super().__init__()
+        self.store = ReadinessStore()
+
+    async def publish(self, channel: str, message: dict):
+        self.store.apply_event(channel, message)
+        await self._deliver(channel, message)
+
+    async def set_ready(self, session_id, client_id, ready):
+        return await self.store.set_ready(session_id, client_id, ready)
+
+    async def remove_client(self, session_id, client_id):
+        return await self.store.remove_client(session_id, client_id)
+
+    async def snapshot(self, session_id):
+        return await self.store.snapshot(session_id)
+
+    async def claim_changes(self, session_id):
+        return await self.store.claim_changes(session_id)
+
+# --- Unix socket hub ------------------------------------------------------
+# Newline-delimited JSON. Requests {"id", "op", "args"} get {"id", "result"}
+# or {"id", "error"}; {"op": "publish", "channel", "message"} is forwarded to
+# every connected worker as {"channel", "message"}.
+
+def _encode_snapshot(snapshot: ReadinessSnapshot):
+    return {"version": snapshot.version, "players": list(snapshot.players.items())}
+
+def _decode_snapshot(data) -> ReadinessSnapshot:
+    return ReadinessSnapshot(data["version"], {cid: ready for cid, ready in data["players"]})
+
+def _encode_line(payload: dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), default=str).encode() + b"\n"
+
+class _Hub:
+    def __init__(self):
+        self.store = ReadinessStore()
+        self.writers = set()
+
+    async def _dispatch(self, op: str, args):
+        if op == "set_ready":
+            return _encode_snapshot(await self.store.set_ready(*args))
+        if op == "remove_client":
+            return _encode_snapshot(await self.store.remove_client(*args))
+        if op == "snapshot":
+            return _encode_snapshot(await self.store.snapshot(*args))
+        if op == "claim_changes":
+            from_version, snapshot, changes = await self.store.claim_changes(*args)
+            return [from_version, _encode_snapshot(snapshot), None if changes is None else list(changes.items())]
+        raise ValueError(f"Unknown op {op!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                if request["op"] == "publish":
+                    self.store.apply_event(request["channel"], request["message"])
+                    out = _encode_line({"channel": request["channel"], "message": request["message"]})
+                    for peer in list(self.writers):
+                        peer.write(out)
+                    await asyncio.gather(*(peer.drain() for peer in list(self.writers)), return_exceptions=True)
+                    continue
+                try:
+                    response = {"id": request["id"], "result": await self._dispatch(request["op"], request["args"])}
+                except Exception as e:
+                    response = {"id": request["id"], "error": str(e)}
+                writer.write(_encode_line(response))
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # Peer went away, or the hub is shutting down
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def close(self):
+        for writer in list(self.writers):
+            writer.close()
+
+class UnixSocketBackend(SessionBackend):
+    def __init__(self, path: str, request_timeout: float):
+        super().__init__()
+        self.path = path
+        self.request_timeout = request_timeout
+        self.is_hub = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._hub: Optional[_Hub] = None
+        self._lock_fd: Optional[int] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _try_host_hub(self):
+        # Whoever holds the flock on "<socket>.lock" hosts the hub. The kernel
+        # drops the lock when that process dies, so a surviving worker can take
+        # over; binding alone is not enough since asyncio replaces a stale
+        # socket file, which would let two workers race for the same path.
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return  # Another worker hosts the hub
+        hub = _Hub()
+        self._server = await asyncio.start_unix_server(
+            hub.handle, path=self.path, limit=config.SESSION_BACKEND_MAX_MESSAGE_BYTES
+        )
+        self._hub = hub
+        self._lock_fd = lock_fd
+        self.is_hub = True
+        logger.info("Session backend hub listening on %s (pid %s)", self.path, os.getpid())
+
+    async def _run(self):
+        while True:
+            try:
+                if self._server is None:
+                    await self._try_host_hub()
+                reader, self._writer = await asyncio.open_unix_connection(
+                    self.path, limit=config.SESSION_BACKEND_MAX_MESSAGE_BYTES
+                )
+                self._connected.set()
+                await self._read_loop(reader)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, ValueError) as e:
+                logger.warning("Session backend connection lost: %s", e)
+            self._connected.clear()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Session backend hub went away"))
+            self._pending.clear()
+            await asyncio.sleep(config.SESSION_BACKEND_RECONNECT_SECONDS)
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            payload = json.loads(line)
+            if "channel" in payload:
+                await self._deliver(payload["channel"], payload["message"])
+                continue
+            future = self._pending.pop(payload["id"], None)
+            if future is None or future.done():
+                continue
+            if "error" in payload:
+                future.set_exception(RuntimeError(payload["error"]))
+            else:
+                future.set_result(payload["result"])
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        await asyncio.wait_for(self._connected.wait(), timeout=self.request_timeout)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        if self._server is not None:
+            self._server.close()
+            self._hub.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            os.close(self._lock_fd)
+
+    async def _send(self, payload: dict):
+        await asyncio.wait_for(self._connected.wait(), timeout=self.request_timeout)
+        self._writer.write(_encode_line(payload))
+        await self._writer.drain()
+
+    async def _request(self, op: str, *args):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({"id": request_id, "op": op, "args": list(args)})
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def publish(self, channel: str, message: dict):
+        await self._send({"op": "publish", "channel": channel, "message": message})
+
+    async def set_ready(self, session_id, client_id, ready):
+        return _decode_snapshot(await self._request("set_ready", session_id, client_id, ready))
+
+    async def remove_client(self, session_id, client_id):
+        return _decode_snapshot(await self._request("remove_client", session_id, client_id))
+
+    async def snapshot(self, session_id):
+        return _decode_snapshot(await self._request("snapshot", session_id))
+
+    async def claim_changes(self, session_id):
+        from_version, snapshot, changes = await self._request("claim_changes", session_id)
+        return from_version, _decode_snapshot(snapshot), None if changes is None else dict(changes)
+
+def create_backend(kind: str) -> SessionBackend:
+    if kind == "inprocess":
+        return InProcessBackend()
+    if kind == "unix":
+        return UnixSocketBackend(config.SESSION_BACKEND_SOCKET, config.SESSION_BACKEND_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown session backend {kind!r}")
+
+session_backend = create_backend(config.SESSION_BACKEND)
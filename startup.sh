@@ -1,10 +1,8 @@
 #!/bin/bash
-# Activate migrations (Clean Database Initialization)
-flask shell <<EOF
-from main import db
-db.drop_all()
-db.create_all()
-EOF
+set -e
 
-# Run Flask application via Gunicorn
-gunicorn -b 0.0.0.0:5000 main:app
+# One-time schema creation and seed load (idempotent; see bootstrap.py)
+python -m bootstrap
+
+# App workers only serve requests; they no longer touch the schema on boot
+exec uvicorn main:app --host 0.0.0.0 --port "${PORT:-5000}" --workers "${WEB_CONCURRENCY:-1}"
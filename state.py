@@ -1,6 +1,105 @@
-from typing import Dict
-import threading
+from collections import deque
+from typing import Dict, NamedTuple, Optional, Tuple
+import asyncio
+import config
+
+class ReadinessSnapshot(NamedTuple):
+    version: int
+    players: Dict[str, bool]  # client_id -> ready, in join order
+
+    @property
+    def all_ready(self) -> bool:
+        return bool(self.players) and all(self.players.values())
+
+class SessionState:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.players: Dict[str, bool] = {}
+        self.version = 0
+        # Last version handed to the lobby broadcaster (claim_changes)
+        self.broadcast_version = 0
+        # (version, client_id, ready or None when the client left), oldest first
+        self.changelog = deque(maxlen=config.READINESS_CHANGELOG_SIZE)
+
+    def record(self, client_id: str, ready: Optional[bool]):
+        self.version += 1
+        self.changelog.append((self.version, client_id, ready))
+
+    def snapshot(self) -> ReadinessSnapshot:
+        return ReadinessSnapshot(self.version, dict(self.players))
+
+    def changes_since(self, version: int) -> Optional[Dict[str, Optional[bool]]]:
+        # Net changes after `version`; None when the changelog no longer reaches back that far
+        if version >= self.version:
+            return {}
+        if not self.changelog or self.changelog[0][0] > version + 1:
+            return None
+        changes = {}
+        for entry_version, client_id, ready in self.changelog:
+            if entry_version > version:
+                changes[client_id] = ready
+        return changes
+
+class ReadinessStore:
+    """Per-session readiness state.
+
+    Each session has its own asyncio.Lock and a version that increases by one
+    on every change. Mutators return the committed snapshot; callers broadcast
+    it after the lock is released, so a slow broadcast never blocks other
+    updates.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, SessionState] = {}
+
+    def _session(self, session_id: str) -> SessionState:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = SessionState()
+        return state
+
+    async def set_ready(self, session_id: str, client_id: str, ready: bool) -> ReadinessSnapshot:
+        state = self._session(session_id)
+        async with state.lock:
+            state.players[client_id] = ready
+            state.record(client_id, ready)
+            return state.snapshot()
+
+    async def add_client(self, session_id: str, client_id: str) -> ReadinessSnapshot:
+        # A (re)joining client always starts out not ready
+        return await self.set_ready(session_id, client_id, False)
+
+    async def remove_client(self, session_id: str, client_id: str) -> ReadinessSnapshot:
+        state = self._session(session_id)
+        async with state.lock:
+            if state.players.pop(client_id, None) is not None:
+                state.record(client_id, None)
+            return state.snapshot()
+
+    async def snapshot(self, session_id: str) -> ReadinessSnapshot:
+        state = self._sessions.get(session_id)
+        if state is None:
+            return ReadinessSnapshot(0, {})
+        async with state.lock:
+            return state.snapshot()
+
+    async def claim_changes(self, session_id: str) -> Tuple[int, ReadinessSnapshot, Optional[Dict[str, Optional[bool]]]]:
+        # Net changes since the last claim, advancing the broadcast cursor in the
+        # same critical section so concurrent flushers never send a change twice
+        state = self._sessions.get(session_id)
+        if state is None:
+            return 0, ReadinessSnapshot(0, {}), {}
+        async with state.lock:
+            from_version = state.broadcast_version
+            state.broadcast_version = state.version
+            return from_version, state.snapshot(), state.changes_since(from_version)
+
+    def clear(self):
+        self._sessions.clear()
+
+    def apply_event(self, channel: str, message: dict):
+        # Called once per published message by whoever holds this store, so
+        # /status stops reporting sessions that were deleted
+        if channel == "lobby:*" and message.get("op") == "clear":
+            self.clear()
 
-# Shared global state
-session_readiness: Dict[str, Dict[str, bool]] = {}
-lock = threading.Lock()
@@ -0,0 +1,12 @@
+# Modules are imported from the repository root, as the app and benchmarks do
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# App tests run against a throwaway SQLite file, never the configured server
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='epsilon-tests-'), 'epsilon.db')}")
+os.environ.setdefault("EPSILON_BOOTSTRAP_ON_STARTUP", "1")
+os.environ.setdefault("EPSILON_MAP_CACHE_DIR", tempfile.mkdtemp(prefix="epsilon-maps-"))
@@ -0,0 +1,71 @@
+"""Round trips of every frame kind in utils/binary_frames.py.
+
+    python -m pytest tests
+"""
+import pytest
+from utils import binary_frames
+from utils.binary_frames import decode_frame, encode_frame, encode_layout
+from utils.labyrinth_grid import generate_masks
+
+PLAYERS = [{"client_id": "alpha", "ready": True}, {"client_id": "bravo-é", "ready": False}]
+
+FRAMES = {
+    "full": {"players": PLAYERS, "all_ready": False, "version": 7},
+    "snapshot": {"type": "snapshot", "players": PLAYERS, "all_ready": False, "version": 7},
+    "delta": {
+        "type": "delta",
+        "from_version": 7,
+        "version": 9,
+        "changes": [{"client_id": "alpha", "ready": False}, {"client_id": "charlie", "ready": None}],
+        "all_ready": False
+    },
+    "tick": {
+        "type": "tick",
+        "tick": 42,
+        "positions": [{"client_id": "alpha", "x": 3, "y": 999}],
+        "fog": [{"client_id": "alpha", "cells": [[3, 999, 5], [3, 998, 12]]}, {"client_id": "bravo-é", "cells": []}]
+    },
+}
+
+@pytest.mark.parametrize("name", sorted(FRAMES))
+def test_frame_round_trip(name):
+    message = FRAMES[name]
+    data = encode_frame(message)
+    assert data is not None
+    assert decode_frame(data) == message
+
+@pytest.mark.parametrize("name, kind", [
+    ("full", binary_frames.FULL),
+    ("snapshot", binary_frames.SNAPSHOT),
+    ("delta", binary_frames.DELTA),
+    ("tick", binary_frames.TICK),
+])
+def test_frame_kind_byte(name, kind):
+    assert encode_frame(FRAMES[name])[0] == kind
+
+def test_empty_frames_round_trip():
+    for message in (
+        {"players": [], "all_ready": False, "version": 0},
+        {"type": "delta", "from_version": 1, "version": 1, "changes": [], "all_ready": True},
+        {"type": "tick", "tick": 0, "positions": [], "fog": []},
+    ):
+        assert decode_frame(encode_frame(message)) == message
+
+def test_layout_round_trip():
+    masks, start_x, start_y, seed = generate_masks(12, "frames")
+    data = encode_layout(12, start_x, start_y, seed, masks)
+    assert data[0] == binary_frames.LAYOUT
+    assert decode_frame(data) == {
+        "type": "layout", "size": 12, "start_x": start_x, "start_y": start_y,
+        "seed": seed, "masks": bytes(masks)
+    }
+
+def test_frames_without_binary_form_go_out_as_json():
+    assert encode_frame({"type": "resync", "version": 3}) is None
+    assert encode_frame({"type": "tick", "tick": 1}) is None
+    assert encode_frame({"players": [{"client_id": "x" * 256, "ready": True}], "all_ready": True, "version": 1}) is None
+
+@pytest.mark.parametrize("data", [b"", b"\x09", encode_frame(FRAMES["tick"])[:-2], encode_layout(4, 0, 0, "s", bytes(15))])
+def test_malformed_frames_raise_value_error(data):
+    with pytest.raises(ValueError):
+        decode_frame(data)
@@ -0,0 +1,29 @@
+"""Per-request connection counts (/api/metrics/db_pool) for routes whose
+database work runs on the worker pool threads (utils/workers.py).
+
+    python -m pytest tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+from conftest import ROOT
+from db.engine import pool_metrics
+
+@pytest.fixture(scope="module")
+def client():
+    # main mounts frontend/ relative to the working directory
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(ROOT)
+        from main import app
+        with TestClient(app) as client:
+            yield client
+
+@pytest.mark.parametrize("method, path, body", [
+    ("post", "/api/game_sessions/create", {"size": 5}),
+    ("post", "/create-game-session", {"size": 5}),
+    ("post", "/generate-labyrinth?format=columnar", {"size": 5, "seed": "checkouts"}),
+])
+def test_worker_pool_routes_count_their_checkouts(client, method, path, body):
+    total_before = pool_metrics.request_checkouts_total
+    response = getattr(client, method)(path, json=body)
+    assert response.status_code == 200, response.text
+    assert pool_metrics.request_checkouts_total - total_before >= 1
@@ -0,0 +1,182 @@
+"""Per-session tick loop for in-game actions.
+
+Routes queue player actions instead of applying them; each active session has
+one asyncio task that, once per tick (1 / TICK_RATE_HZ seconds), applies
+everything queued since the last tick against the in-memory state
+(movement.py, fog.py) and sends a single frame on /ws/{session_id}:
+
+    {"type": "tick", "tick": 42,
+     "positions": [{"client_id": "a", "x": 3, "y": 1}],
+     "fog": [{"client_id": "a", "cells": [[x, y, mask], ...]}]}
+
+The first action after a quiet spell is applied right away; actions arriving
+while a tick is pending share it. A session with an empty queue does not
+tick; its task waits for the next action and exits after
+TICK_IDLE_SHUTDOWN_SECONDS.
+"""
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+from fog import fog_store
+from movement import movement_engine
+from session_backend import session_backend
+import config
+import realtime
+
+logger = logging.getLogger(__name__)
+
+class Action:
+    __slots__ = ("client_id", "kind", "args", "future")
+
+    def __init__(self, client_id: str, kind: str, args: tuple, future: asyncio.Future):
+        self.client_id = client_id
+        self.kind = kind  # "move" (direction,) or "reveal" ()
+        self.args = args
+        self.future = future
+
+class SessionLoop:
+    def __init__(self):
+        self.actions: List[Action] = []
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.tick = 0
+
+class TickScheduler:
+    def __init__(self, tick_seconds: float, idle_shutdown_seconds: float):
+        self.tick_seconds = tick_seconds
+        self.idle_shutdown_seconds = idle_shutdown_seconds
+        self._loops: Dict[str, SessionLoop] = {}
+        self.ticks = 0
+        self.actions_applied = 0
+        self.max_batch = 0
+        self.tick_seconds_total = 0.0
+        self.tick_seconds_max = 0.0
+        self.overruns = 0
+
+    async def submit(self, session_id: str, client_id: str, kind: str, args: tuple, db: AsyncSession):
+        """Queue an action and wait for the tick that applies it; returns its
+        result (a PlayerPosition for "move", the new cells for "reveal"), or
+        None if the session does not exist. Errors raised while applying
+        (MoveBlocked, ValueError) are raised here."""
+        # State is loaded with the request's DB session, so ticks never query
+        if await movement_engine.session(session_id, db) is None or await fog_store.session(session_id, db) is None:
+            return None
+        loop = self._loops.get(session_id)
+        if loop is None:
+            loop = self._loops[session_id] = SessionLoop()
+        future = asyncio.get_running_loop().create_future()
+        loop.actions.append(Action(client_id, kind, args, future))
+        loop.wakeup.set()
+        if loop.task is None:
+            loop.task = asyncio.create_task(self._run(session_id, loop))
+        return await future
+
+    def _apply(self, session_id: str, actions: List[Action]) -> Optional[dict]:
+        positions, fog = {}, {}
+        for action in actions:
+            try:
+                if action.kind == "move":
+                    player = movement_engine.move(session_id, action.client_id, *action.args)
+                    positions[action.client_id] = player
+                    result = player
+                    cells = fog_store.reveal(session_id, action.client_id, player.x, player.y)
+                elif action.kind == "reveal":
+                    # From where the server has the player, never a client-sent cell
+                    player, _ = movement_engine.spawn(session_id, action.client_id)
+                    cells = result = fog_store.reveal(session_id, action.client_id, player.x, player.y)
+                else:
+                    raise ValueError(f"Unknown action {action.kind!r}")
+            except Exception as e:
+                if not action.future.done():
+                    action.future.set_exception(e)
+                continue
+            if cells:
+                fog.setdefault(action.client_id, []).extend(cells)
+            if not action.future.done():
+                action.future.set_result(result)
+        if not positions and not fog:
+            return None
+        return {
+            "positions": [{"client_id": cid, "x": p.x, "y": p.y} for cid, p in positions.items()],
+            "fog": [{"client_id": cid, "cells": cells} for cid, cells in fog.items()]
+        }
+
+    async def _run(self, session_id: str, loop: SessionLoop):
+        clock = asyncio.get_running_loop().time
+        next_tick = clock()
+        try:
+            while True:
+                if not loop.actions:
+                    loop.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(loop.wakeup.wait(), timeout=self.idle_shutdown_seconds)
+                    except asyncio.TimeoutError:
+                        if not loop.actions:
+                            return
+                    # Back from idle: no catching up on ticks that had nothing to do
+                    next_tick = max(next_tick, clock())
+                delay = next_tick - clock()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                actions, loop.actions = loop.actions, []
+
+                started = time.perf_counter()
+                frame = self._apply(session_id, actions)
+                elapsed = time.perf_counter() - started
+                loop.tick += 1
+                self._record_tick(len(actions), elapsed)
+                if frame is not None:
+                    try:
+                        await realtime.broadcast_session_update(session_id, {"type": "tick", "tick": loop.tick, **frame})
+                    except Exception:
+                        logger.exception("Tick broadcast for session %s failed", session_id)
+
+                next_tick += self.tick_seconds
+                if clock() > next_tick:
+                    # Tick (or broadcast) ran past the next tick's start: skip ahead
+                    self.overruns += 1
+                    next_tick = clock()
+        finally:
+            if self._loops.get(session_id) is loop:
+                del self._loops[session_id]
+            for action in loop.actions:
+                if not action.future.done():
+                    action.future.cancel()
+
+    async def stop(self):
+        tasks = [loop.task for loop in self._loops.values() if loop.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _on_event(self, channel: str, message: dict):
+        # All sessions were destroyed; their queued actions have nothing to apply to
+        if channel == "lobby:*" and message.get("op") == "clear":
+            await self.stop()
+
+    def _record_tick(self, batch: int, elapsed: float):
+        self.ticks += 1
+        self.actions_applied += batch
+        self.max_batch = max(self.max_batch, batch)
+        self.tick_seconds_total += elapsed
+        self.tick_seconds_max = max(self.tick_seconds_max, elapsed)
+
+    def stats(self):
+        return {
+            "active_sessions": len(self._loops),
+            "tick_rate_hz": 1 / self.tick_seconds,
+            "ticks": self.ticks,
+            "actions_applied": self.actions_applied,
+            "max_batch": self.max_batch,
+            "tick_ms": {
+                "avg": (self.tick_seconds_total / self.ticks * 1000) if self.ticks else 0.0,
+                "max": self.tick_seconds_max * 1000
+            },
+            "overruns": self.overruns,
+            "queued": sum(len(loop.actions) for loop in self._loops.values())
+        }
+
+tick_scheduler = TickScheduler(1 / config.TICK_RATE_HZ, config.TICK_IDLE_SHUTDOWN_SECONDS)
+session_backend.subscribe(tick_scheduler._on_event)
@@ -0,0 +1,183 @@
+"""Compact binary encoding of realtime frames and labyrinth layouts.
+
+Opt-in alternative to JSON for clients on slow links: a WebSocket opened with
+?encoding=binary (or an Accept header naming MEDIA_TYPE) gets these frames as
+binary messages, and /generate-labyrinth answers with a LAYOUT frame when
+MEDIA_TYPE is accepted. Every frame is one kind byte followed by
+little-endian fields; strings are a u8 length plus UTF-8 bytes.
+
+    FULL      u32 version, u8 all_ready, u16 n, n * (str client_id, u8 ready)
+    SNAPSHOT  same fields as FULL
+    DELTA     u32 from_version, u32 version, u8 all_ready,
+              u16 n, n * (str client_id, u8 ready: 0, 1, or 2 = left)
+    TICK      u32 tick, u16 n, n * (str client_id, u16 x, u16 y),
+              u16 m, m * (str client_id, u32 k, k * (u16 x, u16 y, u8 mask))
+    LAYOUT    u16 size, u16 start_x, u16 start_y, str seed,
+              size * size bytes: the direction mask of each cell, row-major
+
+decode_frame(encode_frame(message)) == message for every frame lobby.py and
+ticks.py send. Messages with no binary form make encode_frame return None and
+go out as JSON text.
+"""
+from typing import Optional
+import struct
+
+MEDIA_TYPE = "application/vnd.epsilon.frames"
+
+FULL, SNAPSHOT, DELTA, TICK, LAYOUT = 1, 2, 3, 4, 5
+
+_READY = {False: 0, True: 1, None: 2}
+_READY_VALUES = (False, True, None)
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_READINESS = struct.Struct("<IB")        # version, all_ready
+_DELTA = struct.Struct("<IIB")           # from_version, version, all_ready
+_POSITION = struct.Struct("<HH")
+_CELL = struct.Struct("<HHB")
+_LAYOUT = struct.Struct("<HHH")          # size, start_x, start_y
+
+def accepts_binary(accept: Optional[str]) -> bool:
+    return bool(accept) and MEDIA_TYPE in accept
+
+def _put_str(out: bytearray, value: str):
+    data = value.encode()
+    if len(data) > 255:
+        raise ValueError("String longer than 255 bytes")
+    out.append(len(data))
+    out += data
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def unpack(self, fmt: struct.Struct):
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def u8(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def u16(self) -> int:
+        return self.unpack(_U16)[0]
+
+    def u32(self) -> int:
+        return self.unpack(_U32)[0]
+
+    def str(self) -> str:
+        return self.take(self.u8()).decode()
+
+    def take(self, length: int) -> bytes:
+        value = bytes(self.data[self.pos:self.pos + length])
+        if len(value) != length:
+            raise ValueError("Truncated frame")
+        self.pos += length
+        return value
+
+def _encode_readiness(kind: int, message: dict) -> bytes:
+    out = bytearray([kind])
+    out += _READINESS.pack(message["version"], message["all_ready"])
+    out += _U16.pack(len(message["players"]))
+    for player in message["players"]:
+        _put_str(out, player["client_id"])
+        out.append(_READY[player["ready"]])
+    return bytes(out)
+
+def _encode_delta(message: dict) -> bytes:
+    out = bytearray([DELTA])
+    out += _DELTA.pack(message["from_version"], message["version"], message["all_ready"])
+    out += _U16.pack(len(message["changes"]))
+    for change in message["changes"]:
+        _put_str(out, change["client_id"])
+        out.append(_READY[change["ready"]])
+    return bytes(out)
+
+def _encode_tick(message: dict) -> bytes:
+    out = bytearray([TICK])
+    out += _U32.pack(message["tick"])
+    out += _U16.pack(len(message["positions"]))
+    for position in message["positions"]:
+        _put_str(out, position["client_id"])
+        out += _POSITION.pack(position["x"], position["y"])
+    out += _U16.pack(len(message["fog"]))
+    for reveal in message["fog"]:
+        _put_str(out, reveal["client_id"])
+        out += _U32.pack(len(reveal["cells"]))
+        for x, y, mask in reveal["cells"]:
+            out += _CELL.pack(x, y, mask)
+    return bytes(out)
+
+def encode_layout(size: int, start_x: int, start_y: int, seed: str, masks) -> bytes:
+    out = bytearray([LAYOUT])
+    out += _LAYOUT.pack(size, start_x, start_y)
+    _put_str(out, seed)
+    out += masks
+    return bytes(out)
+
+def encode_frame(message: dict) -> Optional[bytes]:
+    """Binary form of a realtime frame, or None if it has none."""
+    kind = message.get("type")
+    try:
+        if kind is None and "players" in message and "version" in message:
+            return _encode_readiness(FULL, message)  # schemas.SessionStatus
+        if kind == "snapshot":
+            return _encode_readiness(SNAPSHOT, message)
+        if kind == "delta":
+            return _encode_delta(message)
+        if kind == "tick":
+            return _encode_tick(message)
+    except (KeyError, ValueError, struct.error):
+        pass
+    return None
+
+def _decode_players(reader: _Reader) -> list:
+    return [
+        {"client_id": reader.str(), "ready": _READY_VALUES[reader.u8()]}
+        for _ in range(reader.u16())
+    ]
+
+def decode_frame(data: bytes) -> dict:
+    """Inverse of encode_frame and encode_layout; raises ValueError on a bad frame."""
+    reader = _Reader(data)
+    try:
+        kind = reader.u8()
+        if kind in (FULL, SNAPSHOT):
+            version, all_ready = reader.unpack(_READINESS)
+            message = {"players": _decode_players(reader), "all_ready": bool(all_ready), "version": version}
+            return message if kind == FULL else {"type": "snapshot", **message}
+        if kind == DELTA:
+            from_version, version, all_ready = reader.unpack(_DELTA)
+            return {
+                "type": "delta",
+                "from_version": from_version,
+                "version": version,
+                "changes": _decode_players(reader),
+                "all_ready": bool(all_ready)
+            }
+        if kind == TICK:
+            tick = reader.u32()
+            positions = []
+            for _ in range(reader.u16()):
+                client_id = reader.str()
+                x, y = reader.unpack(_POSITION)
+                positions.append({"client_id": client_id, "x": x, "y": y})
+            fog = []
+            for _ in range(reader.u16()):
+                client_id = reader.str()
+                cells = [list(reader.unpack(_CELL)) for _ in range(reader.u32())]
+                fog.append({"client_id": client_id, "cells": cells})
+            return {"type": "tick", "tick": tick, "positions": positions, "fog": fog}
+        if kind == LAYOUT:
+            size, start_x, start_y = reader.unpack(_LAYOUT)
+            seed = reader.str()
+            return {
+                "type": "layout", "size": size, "start_x": start_x, "start_y": start_y,
+                "seed": seed, "masks": reader.take(size * size)
+            }
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed frame: {e}")
+    raise ValueError(f"Unknown frame kind {kind}")
@@ -1,104 +1,104 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import Optional
-import random
 import uuid
 from models.labyrinth import Labyrinth
 from models.tile import Tile
+from utils.labyrinth_grid import (
+    DIRECTIONS,
+    OPPOSITE,
+    LAYOUT_FORMAT_NIBBLES,
+    MASK_DIRECTIONS,
+    MASK_IMAGES,
+    MASK_TILE_TYPES,
+    generate_masks,
+    get_image_filename,
+    get_tile_type_from_directions,
+    new_bitset,
+    pack_masks,
+)
+import config
 import json
 
-DIRECTIONS = {"N": (0, -1), "S": (0, 1), "E": (1, 0), "W": (-1, 0)}
-OPPOSITE = {"N": "S", "S": "N", "E": "W", "W": "E"}
+def generate_labyrinth(size: int, seed: Optional[str], db: Session, materialize_tiles: Optional[bool] = None):
+    labyrinth = create_labyrinth(size, seed, db, materialize_tiles)
 
-def get_tile_type_from_directions(directions):
-    if len(directions) == 1:
-        return "dead_end"
-    elif len(directions) == 2:
-        if ("N" in directions and "S" in directions) or ("E" in directions and "W" in directions):
-            return "corridor"
-        else:
-            return "turn"
-    elif len(directions) == 3:
-        return "t_section"
-    else:
-        return "crossroad"
-
-def get_image_filename(tile_type, directions):
-    if tile_type == "dead_end":
-        return f"tile_dead_end_{directions[0]}.png"
-    elif tile_type == "corridor":
-        dirs = ''.join(sorted(directions))
-        return f"tile_corridor_{dirs}.png"
-    elif tile_type == "turn":
-        dirs = ''.join(sorted(directions))
-        return f"tile_turn_{dirs}.png"
-    elif tile_type == "t_section":
-        missing_dir = (set("NSEW") - set(directions)).pop()
-        return f"tile_t_section_{missing_dir}.png"
-    else:  # crossroad
-        return "tile_crossroad.png"
-
-def generate_labyrinth(size: int, seed: Optional[str], db: Session):
-    if size < 4 or size > 10:
-        raise ValueError("Size must be between 4 and 10")
-
-    if not seed:
-        seed = uuid.uuid4().hex
-    random.seed(seed)
-
-    visited = [[False] * size for _ in range(size)]
-    tile_map = {}
-
-    def dfs(x, y):
-        visited[y][x] = True
-        directions = list(DIRECTIONS.keys())
-        random.shuffle(directions)
-        current_open = []
-
-        for direction in directions:
-            nx, ny = x + DIRECTIONS[direction][0], y + DIRECTIONS[direction][1]
-            if 0 <= nx < size and 0 <= ny < size and not visited[ny][nx]:
-                current_open.append(direction)
-                dfs(nx, ny)
-                neighbor_tile = tile_map[(nx, ny)]
-                neighbor_tile['open_directions'].append(OPPOSITE[direction])
-
-        tile_map[(x, y)] = {'x': x, 'y': y, 'open_directions': current_open}
-
-    start_x, start_y = random.randint(0, size - 1), random.randint(0, size - 1)
-    dfs(start_x, start_y)
-
-    labyrinth = Labyrinth(size=size, seed=seed, start_x=start_x, start_y=start_y)
-    db.add(labyrinth)
-    db.commit()
-    db.refresh(labyrinth)
-
-    tiles_response = []
-
-    for (x, y), tile_data in tile_map.items():
-        directions = sorted(tile_data['open_directions'])
-        tile_type = get_tile_type_from_directions(directions)
-
-        open_dirs_db = directions[0] if len(directions) == 1 else json.dumps(directions)
-
-        tile = Tile(
-            labyrinth_id=labyrinth.id,
-            x=x,
-            y=y,
-            type=tile_type,
-            open_directions=open_dirs_db
-        )
-        db.add(tile)
-
-        tile_image = get_image_filename(tile_type, directions)
-        tiles_response.append({
+    # DO NOT assign tiles_response to labyrinth ORM object
+    # Return them separately instead
+    return labyrinth, tiles_from_masks(labyrinth.masks, size)
+
+def create_labyrinth(size: int, seed: Optional[str], db: Session, materialize_tiles: Optional[bool] = None,
+                     generate=generate_masks, pooled: bool = False) -> Labyrinth:
+    # generate: callable with generate_masks' signature, e.g. one that hands
+    # large boards to a process pool (utils.workers); pooled marks labyrinths
+    # generated ahead of time by utils.labyrinth_pool
+    masks, start_x, start_y, seed = generate(size, seed)
+
+    labyrinth = Labyrinth(
+        id=uuid.uuid4(),
+        size=size,
+        seed=seed,
+        start_x=start_x,
+        start_y=start_y,
+        layout=pack_masks(masks),
+        layout_format=LAYOUT_FORMAT_NIBBLES,
+        revealed_bits=bytes(new_bitset(size * size)),
+        pooled=pooled or None
+    )
+    labyrinth.__dict__["_masks"] = masks
+
+    if materialize_tiles is None:
+        materialize_tiles = config.MATERIALIZE_TILE_ROWS and size <= config.LEGACY_TILE_ROWS_MAX_SIZE
+    tile_rows = build_tile_rows(labyrinth) if materialize_tiles else []
+
+    persist_labyrinth(db, labyrinth, tile_rows)
+    return labyrinth
+
+def tiles_from_masks(masks, size: int):
+    tiles = []
+    for index, mask in enumerate(masks):
+        y, x = divmod(index, size)
+        tiles.append({
             "x": x,
             "y": y,
-            "type": tile_type,
-            "image": tile_image
+            "type": MASK_TILE_TYPES[mask],
+            "open_directions": list(MASK_DIRECTIONS[mask]),
+            "image": MASK_IMAGES[mask]
         })
+    return tiles
+
+def build_tile_rows(labyrinth: Labyrinth):
+    # Legacy one-row-per-cell representation, derived from the packed layout
+    tile_rows = []
+    for index, mask in enumerate(labyrinth.masks):
+        y, x = divmod(index, labyrinth.size)
+        directions = MASK_DIRECTIONS[mask]
+        tile_rows.append({
+            "labyrinth_id": labyrinth.id,
+            "x": x,
+            "y": y,
+            "type": MASK_TILE_TYPES[mask],
+            "open_directions": directions[0] if len(directions) == 1 else json.dumps(directions)
+        })
+    return tile_rows
 
+def materialize_tiles(db: Session, labyrinth: Labyrinth):
+    # Backfill Tile rows for a packed labyrinth that was stored without them
+    if db.query(Tile.id).filter(Tile.labyrinth_id == labyrinth.id).first() is not None:
+        return
+    db.execute(insert(Tile), build_tile_rows(labyrinth))
     db.commit()
 
-    # DO NOT assign tiles_response to labyrinth ORM object
-    # Return them separately instead
-    return labyrinth, tiles_response
+def persist_labyrinth(db: Session, labyrinth: Labyrinth, tile_rows):
+    # Labyrinth and all of its tiles go out in a single transaction: the labyrinth
+    # row is flushed first (tiles reference it) and the tiles follow as one
+    # executemany INSERT instead of one ORM object per cell.
+    try:
+        db.add(labyrinth)
+        db.flush()
+        if tile_rows:
+            db.execute(insert(Tile), tile_rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
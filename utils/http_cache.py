@@ -0,0 +1,18 @@
+# utils/http_cache.py
+from fastapi import Request, Response
+import hashlib
+import json
+
+def conditional_json(request: Request, payload) -> Response:
+    """JSON response with a content-hash ETag; 304 when If-None-Match matches.
+
+    Pollers still cost the query that builds the payload, but an unchanged
+    page is neither re-sent nor re-parsed by the client.
+    """
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True, default=str).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from uuid import UUID
+import threading
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.labyrinth import Labyrinth
+from utils.corrected_labyrinth_backend_seed_fixed import create_labyrinth
+from utils.labyrinth_grid import LAYOUT_FORMAT_NIBBLES, generate_masks, pack_masks
+import config
+
+class LabyrinthRecord(NamedTuple):
+    id: UUID
+    size: int
+    seed: str
+    start_x: int
+    start_y: int
+    masks: bytes  # row-major direction masks, see utils.labyrinth_grid
+
+def record_from_row(labyrinth: Labyrinth) -> LabyrinthRecord:
+    return LabyrinthRecord(
+        id=labyrinth.id,
+        size=labyrinth.size,
+        seed=labyrinth.seed,
+        start_x=labyrinth.start_x,
+        start_y=labyrinth.start_y,
+        masks=bytes(labyrinth.masks)
+    )
+
+class LabyrinthCache:
+    """Bounded LRU of generated labyrinths, addressable by (size, seed) and by id."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._records = OrderedDict()  # labyrinth id -> LabyrinthRecord, oldest first
+        self._ids_by_key = {}          # (size, seed) -> labyrinth id
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, size: int, seed: str) -> Optional[LabyrinthRecord]:
+        with self._lock:
+            labyrinth_id = self._ids_by_key.get((size, seed))
+            if labyrinth_id is None:
+                return None
+            self._records.move_to_end(labyrinth_id)
+            self.hits += 1
+            return self._records[labyrinth_id]
+
+    def get_by_id(self, labyrinth_id: UUID) -> Optional[LabyrinthRecord]:
+        with self._lock:
+            record = self._records.get(labyrinth_id)
+            if record is not None:
+                self._records.move_to_end(labyrinth_id)
+                self.hits += 1
+            return record
+
+    def put(self, record: LabyrinthRecord):
+        with self._lock:
+            self._records[record.id] = record
+            self._records.move_to_end(record.id)
+            self._ids_by_key[(record.size, record.seed)] = record.id
+            while len(self._records) > self.max_entries:
+                _, evicted = self._records.popitem(last=False)
+                self._ids_by_key.pop((evicted.size, evicted.seed), None)
+                self.evictions += 1
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._ids_by_key.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+labyrinth_cache = LabyrinthCache(config.LABYRINTH_CACHE_SIZE)
+
+def _ensure_layout(db: Session, labyrinth: Labyrinth):
+    # Labyrinths stored before the packed format only have Tile rows. Layouts
+    # are deterministic in (size, seed), so rebuild and backfill the packed column.
+    if labyrinth.layout is None:
+        masks, _, _, _ = generate_masks(labyrinth.size, labyrinth.seed)
+        labyrinth.layout = pack_masks(masks)
+        labyrinth.layout_format = LAYOUT_FORMAT_NIBBLES
+        db.commit()
+
+def _lookup(db: Session, size: int, seed: str) -> Optional[LabyrinthRecord]:
+    labyrinth = db.query(Labyrinth).filter(Labyrinth.size == size, Labyrinth.seed == seed).first()
+    if labyrinth is None:
+        return None
+    _ensure_layout(db, labyrinth)
+    return record_from_row(labyrinth)
+
+def get_or_create_labyrinth(size: int, seed: Optional[str], db: Session, generate=generate_masks) -> LabyrinthRecord:
+    """Return the labyrinth for (size, seed), generating and storing it only once.
+
+    Lookup order: in-process LRU, then the labyrinths table, then the generator.
+    Without a seed a fresh random labyrinth is always generated.
+    """
+    if seed:
+        record = labyrinth_cache.get(size, seed)
+        if record is not None:
+            return record
+        record = _lookup(db, size, seed)
+        if record is not None:
+            labyrinth_cache.count("db_hits")
+            labyrinth_cache.put(record)
+            return record
+
+    labyrinth_cache.count("misses")
+    try:
+        labyrinth = create_labyrinth(size, seed, db, generate=generate)
+    except IntegrityError:
+        # Another request stored the same (size, seed) first
+        record = _lookup(db, size, seed)
+        if record is None:
+            raise
+    else:
+        record = record_from_row(labyrinth)
+    labyrinth_cache.put(record)
+    return record
+
+def load_labyrinth(labyrinth_id: UUID, db: Session) -> Optional[LabyrinthRecord]:
+    record = labyrinth_cache.get_by_id(labyrinth_id)
+    if record is not None:
+        return record
+    labyrinth = db.get(Labyrinth, labyrinth_id)
+    if labyrinth is None:
+        return None
+    _ensure_layout(db, labyrinth)
+    record = record_from_row(labyrinth)
+    labyrinth_cache.count("db_hits")
+    labyrinth_cache.put(record)
+    return record
@@ -0,0 +1,218 @@
+"""Encoded labyrinth responses, built once per labyrinth and served from memory.
+
+Two JSON shapes:
+
+* "tiles": the original LabyrinthResponse, one object per cell
+* "columnar": every cell as one hex digit of its direction mask, plus the
+  16-entry lookup table (type, open directions, image) those digits index:
+
+    {"id": "...", "seed": "...", "size": 3, "start_x": 0, "start_y": 2,
+     "masks": "6ac3...", "lut": [{"type": ..., "open_directions": [...], "image": ...}, ...]}
+
+Bodies are serialized with orjson when it is installed (plain json
+otherwise) and compressed with brotli or gzip as the client's
+Accept-Encoding allows. Layouts never change, so the encoded bytes are
+cached per (labyrinth, format, encoding) and a repeat fetch is a dict lookup.
+
+The tiles shape costs about 90 bytes per cell, so check_format() refuses it
+past TILES_FORMAT_MAX_SIZE. Large boards can also be read in parts:
+region_payload() covers a rectangle in the columnar shape, and stream_rows()
+sends the whole board as NDJSON, one band of rows per line.
+"""
+from collections import OrderedDict
+from typing import Optional
+import gzip
+import json
+import threading
+from fastapi import Request, Response
+from utils.corrected_labyrinth_backend_seed_fixed import tiles_from_masks
+from utils.labyrinth_grid import MASK_DIRECTIONS, MASK_IMAGES, MASK_TILE_TYPES
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ("tiles", "columnar")
+
+LUT = [
+    {"type": t, "open_directions": list(d), "image": image}
+    for t, d, image in zip(MASK_TILE_TYPES, MASK_DIRECTIONS, MASK_IMAGES)
+]
+_HEX_DIGITS = bytes.maketrans(bytes(range(16)), b"0123456789abcdef")
+
+# Smaller bodies are sent as is: compression would barely pay for its header
+MIN_COMPRESS_BYTES = 1024
+
+def check_format(fmt: str, size: int):
+    if fmt not in FORMATS:
+        raise ValueError(f"Format must be one of {', '.join(FORMATS)}")
+    if fmt == "tiles" and size > config.TILES_FORMAT_MAX_SIZE:
+        raise ValueError(
+            f"The tiles format is limited to size {config.TILES_FORMAT_MAX_SIZE}; "
+            "use format=columnar, /region or /stream for larger labyrinths"
+        )
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+def tiles_payload(record) -> dict:
+    # Same shape as main.LabyrinthResponse
+    return {
+        "seed": record.seed,
+        "start_x": record.start_x,
+        "start_y": record.start_y,
+        "tiles": tiles_from_masks(record.masks, record.size)
+    }
+
+def columnar_payload(record) -> dict:
+    return {
+        "id": str(record.id),
+        "seed": record.seed,
+        "size": record.size,
+        "start_x": record.start_x,
+        "start_y": record.start_y,
+        "masks": bytes(record.masks).translate(_HEX_DIGITS).decode("ascii"),
+        "lut": LUT
+    }
+
+def clip_region(size: int, x: int, y: int, width: int, height: int):
+    # -> (x, y, width, height) of the rectangle's part that lies on the board
+    x1, y1 = min(size, x + width), min(size, y + height)
+    x, y = max(0, x), max(0, y)
+    if x >= x1 or y >= y1:
+        raise ValueError(f"Region lies outside the {size}x{size} labyrinth")
+    return x, y, x1 - x, y1 - y
+
+def region_masks(record, x: int, y: int, width: int, height: int) -> str:
+    # One row slice per region row, so the cost follows the region, not the board
+    size, masks = record.size, record.masks
+    rows = b"".join(masks[row * size + x:row * size + x + width] for row in range(y, y + height))
+    return rows.translate(_HEX_DIGITS).decode("ascii")
+
+def region_payload(record, x: int, y: int, width: int, height: int) -> dict:
+    """Columnar payload for a rectangle, clipped to the board; "masks" holds
+    width * height digits, row-major within the region, indexing LUT."""
+    x, y, width, height = clip_region(record.size, x, y, width, height)
+    return {
+        "id": str(record.id),
+        "size": record.size,
+        "x": x,
+        "y": y,
+        "width": width,
+        "height": height,
+        "masks": region_masks(record, x, y, width, height)
+    }
+
+def stream_rows(record, rows_per_chunk: int):
+    """NDJSON for the whole board, a band of rows per line: first the
+    columnar header without masks, then {"y", "height", "masks"} per band."""
+    header = columnar_payload(record)
+    del header["masks"]
+    yield dumps(header) + b"\n"
+    size = record.size
+    for y in range(0, size, rows_per_chunk):
+        height = min(rows_per_chunk, size - y)
+        yield dumps({"y": y, "height": height, "masks": region_masks(record, 0, y, size, height)}) + b"\n"
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+def encode_body(body: bytes, encoding: str):
+    # -> (body, content encoding actually applied)
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, "identity"
+    if encoding == "br":
+        return brotli.compress(body, quality=5), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0), encoding
+    return body, "identity"
+
+class LabyrinthPayloadCache:
+    """LRU of encoded responses, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._bodies = OrderedDict()  # (labyrinth id, format, encoding) -> (bytes, content encoding), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def body(self, record, fmt: str, encoding: str):
+        # -> (bytes, content encoding)
+        key = (record.id, fmt, encoding)
+        with self._lock:
+            entry = self._bodies.get(key)
+            if entry is not None:
+                self._bodies.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        # Built outside the lock; a concurrent duplicate just loses the race
+        payload = columnar_payload(record) if fmt == "columnar" else tiles_payload(record)
+        entry = encode_body(dumps(payload), encoding)
+        # One huge tiles body would flush everything else
+        if len(entry[0]) <= self.max_bytes // 4:
+            with self._lock:
+                if key not in self._bodies:
+                    self._bodies[key] = entry
+                    self._bytes += len(entry[0])
+                while self._bytes > self.max_bytes:
+                    _, (evicted, _) = self._bodies.popitem(last=False)
+                    self._bytes -= len(evicted)
+        return entry
+
+    def response(self, request: Request, record, fmt: str) -> Response:
+        check_format(fmt, record.size)
+        encoding = choose_encoding(request.headers.get("accept-encoding"))
+        # Layouts are immutable, so the id, format and encoding identify the bytes
+        etag = f'"{record.id.hex}-{fmt}-{encoding}"'
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if etag in (tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        body, content_encoding = self.body(record, fmt, encoding)
+        if content_encoding != "identity":
+            headers["Content-Encoding"] = content_encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._bodies),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "serializer": "orjson" if orjson is not None else "json",
+                "brotli": brotli is not None
+            }
+
+labyrinth_payloads = LabyrinthPayloadCache(config.LABYRINTH_PAYLOAD_CACHE_BYTES)
@@ -0,0 +1,165 @@
+from collections import deque
+from typing import Dict, Iterable, Optional
+import asyncio
+import logging
+import threading
+import time
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session
+from models.game_session import GameSession
+from models.labyrinth import Labyrinth
+from utils.corrected_labyrinth_backend_seed_fixed import create_labyrinth
+from utils.labyrinth_cache import LabyrinthRecord, get_or_create_labyrinth, labyrinth_cache, record_from_row
+from utils.labyrinth_grid import generate_masks
+import config
+
+logger = logging.getLogger(__name__)
+
+class LabyrinthPool:
+    """Pre-generated, already persisted labyrinths per board size.
+
+    Session creation claims from the pool; a background task tops each size
+    back up to high_water whenever it drops below low_water, so generation and
+    its DB writes stay off the request path.
+
+    Pooled labyrinths are stored rows marked `pooled` that no session
+    references yet, so the pool is not lost with the process: the first refill
+    of a size takes those rows before generating any. Only rows the pool
+    generated are taken; a labyrinth from /generate-labyrinth or a seeded
+    create could be known to the caller in advance. Nothing is filled at boot;
+    the first claim of a size starts its refill. Workers may pool the same
+    stored row, and then two sessions share a layout, as sessions created with
+    the same seed already do.
+    """
+
+    def __init__(self, sizes: Iterable[int], low_water: int, high_water: int, session_factory=None):
+        self.low_water = low_water
+        self.high_water = high_water
+        self._session_factory = session_factory
+        self._pools: Dict[int, deque] = {size: deque() for size in sizes}
+        self._lock = threading.Lock()
+        self._active = set()     # sizes claimed at least once; only these are refilled
+        self._reclaimed = set()  # sizes whose stored labyrinths were already taken
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.claims = 0
+        self.empty_claims = 0
+        self.generated = 0
+        self.claim_seconds_total = 0.0
+        self.claim_seconds_max = 0.0
+
+    def depth(self, size: int) -> int:
+        with self._lock:
+            return len(self._pools.get(size, ()))
+
+    def claim(self, size: int) -> Optional[LabyrinthRecord]:
+        with self._lock:
+            pool = self._pools.get(size)
+            if pool is not None:
+                self._active.add(size)
+            record = pool.popleft() if pool else None
+            needs_refill = pool is not None and len(pool) < self.low_water
+        if needs_refill:
+            self._request_refill()
+        return record
+
+    def acquire(self, size: int, db: Session, generate=generate_masks) -> LabyrinthRecord:
+        # Claim a pooled labyrinth, falling back to inline generation when the
+        # pool for this size is empty (or the size is not pooled at all).
+        started = time.perf_counter()
+        record = self.claim(size)
+        pooled = record is not None
+        if not pooled:
+            record = get_or_create_labyrinth(size, None, db, generate=generate)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.claims += 1
+            if not pooled:
+                self.empty_claims += 1
+            self.claim_seconds_total += elapsed
+            self.claim_seconds_max = max(self.claim_seconds_max, elapsed)
+        return record
+
+    def _request_refill(self):
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _generate_one(self, size: int) -> LabyrinthRecord:
+        db = self._session_factory()
+        try:
+            record = record_from_row(create_labyrinth(size, None, db, pooled=True))
+        finally:
+            db.close()
+        labyrinth_cache.put(record)
+        return record
+
+    def _load_unclaimed(self, size: int, limit: int):
+        # Labyrinths this pool generated that no session uses, e.g. pooled by
+        # a worker that has since restarted
+        db = self._session_factory()
+        try:
+            rows = db.scalars(
+                select(Labyrinth)
+                .where(Labyrinth.size == size, Labyrinth.pooled.is_(True), Labyrinth.layout.is_not(None))
+                .where(~exists().where(GameSession.labyrinth_id == Labyrinth.id))
+                .order_by(Labyrinth.created_at.desc())
+                .limit(limit)
+            ).all()
+            return [record_from_row(row) for row in rows]
+        finally:
+            db.close()
+
+    async def _fill(self):
+        with self._lock:
+            sizes = sorted(self._active)
+        for size in sizes:
+            if self.depth(size) >= self.low_water:
+                continue
+            if size not in self._reclaimed:
+                self._reclaimed.add(size)
+                for record in await asyncio.to_thread(self._load_unclaimed, size, self.high_water - self.depth(size)):
+                    labyrinth_cache.put(record)
+                    with self._lock:
+                        self._pools[size].append(record)
+            while self.depth(size) < self.high_water:
+                record = await asyncio.to_thread(self._generate_one, size)
+                with self._lock:
+                    self._pools[size].append(record)
+                    self.generated += 1
+
+    async def run(self):
+        if self._session_factory is None:
+            from db.session import SessionLocal
+            self._session_factory = SessionLocal
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                await self._fill()
+            except Exception:
+                logger.exception("Labyrinth pool refill failed")
+                await asyncio.sleep(config.LABYRINTH_POOL_RETRY_SECONDS)
+                self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": {size: len(pool) for size, pool in self._pools.items()},
+                "low_water": self.low_water,
+                "high_water": self.high_water,
+                "claims": self.claims,
+                "empty_claims": self.empty_claims,
+                "generated": self.generated,
+                "claim_latency_ms": {
+                    "avg": (self.claim_seconds_total / self.claims * 1000) if self.claims else 0.0,
+                    "max": self.claim_seconds_max * 1000
+                }
+            }
+
+labyrinth_pool = LabyrinthPool(
+    sizes=config.LABYRINTH_POOL_SIZES,
+    low_water=config.LABYRINTH_POOL_LOW_WATER,
+    high_water=config.LABYRINTH_POOL_HIGH_WATER
+)
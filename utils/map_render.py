@@ -0,0 +1,175 @@
+"""Whole-labyrinth map images composited from the tile sprites.
+
+The sprites in frontend/tiles are decoded once into a SpriteAtlas (one image
+per direction mask, resized once per tile size), so rendering a map is one
+paste per cell. Rendered PNGs are written to MAP_CACHE_DIR under a name made
+of the labyrinth id, the tile size and a hash of the sprite files; a repeat
+view is the file on disk, and changing a sprite changes every name, so stale
+maps are never served.
+
+Tile sizes come from a small fixed set, so the atlas holds at most one
+resized copy per size. A hit refreshes the file's mtime, and after each
+render the least recently used PNGs are deleted until the directory is back
+under its byte budget.
+"""
+from typing import Dict, Optional
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from PIL import Image
+from utils.labyrinth_grid import MASK_IMAGES
+import config
+
+class SpriteAtlas:
+    def __init__(self, tiles_dir: str):
+        self.tiles_dir = tiles_dir
+        self._sprites: Optional[Dict[int, Image.Image]] = None   # mask -> full-size sprite
+        self._scaled: Dict[int, Dict[int, Image.Image]] = {}     # tile px -> mask -> sprite
+        self.digest = ""
+        self._lock = threading.Lock()
+
+    def _load(self):
+        digest = hashlib.sha256()
+        decoded = {}
+        for name in sorted(set(MASK_IMAGES)):
+            with open(os.path.join(self.tiles_dir, name), "rb") as f:
+                data = f.read()
+            digest.update(name.encode() + b"\0" + data)
+            with Image.open(io.BytesIO(data)) as image:
+                decoded[name] = image.convert("RGB")
+        self._sprites = {mask: decoded[name] for mask, name in enumerate(MASK_IMAGES)}
+        self.digest = digest.hexdigest()[:16]
+
+    def sprites(self, tile_px: int) -> Dict[int, Image.Image]:
+        with self._lock:
+            if self._sprites is None:
+                self._load()
+            scaled = self._scaled.get(tile_px)
+            if scaled is None:
+                resized = {}  # masks sharing a sprite share the resized copy
+                scaled = self._scaled[tile_px] = {
+                    mask: resized.setdefault(id(sprite), sprite.resize((tile_px, tile_px), Image.LANCZOS))
+                    for mask, sprite in self._sprites.items()
+                }
+            return scaled
+
+    def stats(self):
+        with self._lock:
+            return {"loaded": self._sprites is not None, "digest": self.digest, "tile_sizes": sorted(self._scaled)}
+
+def render_map(atlas: SpriteAtlas, record, tile_px: int) -> Image.Image:
+    # record: utils.labyrinth_cache.LabyrinthRecord
+    sprites = atlas.sprites(tile_px)
+    size = record.size
+    image = Image.new("RGB", (size * tile_px, size * tile_px))
+    for index, mask in enumerate(record.masks):
+        y, x = divmod(index, size)
+        image.paste(sprites[mask], (x * tile_px, y * tile_px))
+    return image
+
+class MapCache:
+    def __init__(self, atlas: SpriteAtlas, cache_dir: str, max_side_px: int, max_bytes: int,
+                 tile_px_sizes=config.MAP_TILE_PX_SIZES):
+        self.atlas = atlas
+        self.cache_dir = cache_dir
+        self.max_side_px = max_side_px
+        self.max_bytes = max_bytes
+        self.tile_px_sizes = tuple(tile_px_sizes)
+        self._rendering: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+        self.evicted = 0
+
+    def _touch(self, path: str):
+        # mtime is the recency evict() goes by
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def evict(self, keep: str):
+        """Delete the least recently used PNGs until the directory fits max_bytes."""
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".png"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evicted += 1
+
+    def path(self, record, tile_px: int) -> str:
+        """Path of the rendered PNG, rendering it first if it is not on disk."""
+        if tile_px not in self.tile_px_sizes:
+            raise ValueError(f"Tile size must be one of {', '.join(map(str, self.tile_px_sizes))} px")
+        if record.size * tile_px > self.max_side_px:
+            raise ValueError(
+                f"A {record.size}x{record.size} map at {tile_px} px per tile exceeds {self.max_side_px} px"
+            )
+        self.atlas.sprites(tile_px)  # loads the atlas, which sets its digest
+        name = f"{record.id.hex}-{tile_px}-{self.atlas.digest}.png"
+        path = os.path.join(self.cache_dir, name)
+        if os.path.exists(path):
+            self.hits += 1
+            self._touch(path)
+            return path
+        with self._lock:
+            lock = self._rendering.setdefault(name, threading.Lock())
+        # Concurrent requests for the same map wait for one render
+        with lock:
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                image = render_map(self.atlas, record, tile_px)
+                fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        image.save(f, "PNG", optimize=True)
+                    os.replace(tmp, path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                self.renders += 1
+                self.evict(keep=path)
+            else:
+                self.hits += 1
+                self._touch(path)
+        with self._lock:
+            self._rendering.pop(name, None)
+        return path
+
+    def options(self):
+        # What /api/maps/options tells the frontend: the tile sizes it may ask
+        # for and the longest map side they must fit in
+        return {"tile_px_sizes": list(self.tile_px_sizes), "max_side_px": self.max_side_px}
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "renders": self.renders,
+            "evicted": self.evicted,
+            "cache_dir": self.cache_dir,
+            "max_bytes": self.max_bytes,
+            **self.options(),
+            "atlas": self.atlas.stats()
+        }
+
+map_cache = MapCache(
+    SpriteAtlas(config.TILES_DIR), config.MAP_CACHE_DIR, config.MAP_MAX_SIDE_PX, config.MAP_CACHE_MAX_BYTES
+)
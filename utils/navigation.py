@@ -0,0 +1,197 @@
+"""Distance fields and shortest paths over a labyrinth's direction masks.
+
+A DistanceField is one multi-source BFS over the whole board: for every cell
+the number of steps to the nearest source and the direction of the first
+step toward it. Fields are cached per labyrinth and per source set, so after
+the first query a distance or next step is one array lookup and a path is
+a walk of its own length. A field costs 5 bytes per cell, so the cache is
+bounded by the total bytes of its fields across all labyrinths. Enemy movement and "distance to exit" hints read
+fields rather than searching again.
+"""
+from array import array
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from uuid import UUID
+import threading
+from utils.labyrinth_grid import DIRECTION_BITS, DIRECTIONS, MASK_DIRECTIONS, OPPOSITE
+import config
+
+BIT_DIRECTIONS = {bit: d for d, bit in DIRECTION_BITS.items()}
+DELTA_DIRECTIONS = {delta: d for d, delta in DIRECTIONS.items()}
+
+def first_step(path: Optional[List[Tuple[int, int]]]) -> Optional[str]:
+    # Direction of the first move along a path, None if there is no move
+    if not path or len(path) < 2:
+        return None
+    (x0, y0), (x1, y1) = path[0], path[1]
+    return DELTA_DIRECTIONS[(x1 - x0, y1 - y0)]
+
+def _step_table(size: int):
+    # Per mask (0..15): the (index offset, bit pointing back) of each open side
+    offsets = {"N": -size, "S": size, "E": 1, "W": -1}
+    return tuple(
+        tuple((offsets[d], DIRECTION_BITS[OPPOSITE[d]]) for d in directions)
+        for directions in MASK_DIRECTIONS
+    )
+
+class DistanceField:
+    def __init__(self, size: int, sources: FrozenSet[int], distances: array, next_steps: bytearray):
+        self.size = size
+        self.sources = sources
+        self.distances = distances    # steps to the nearest source, -1 if unreachable
+        self.next_steps = next_steps  # direction bit of the first step toward it, 0 on a source
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.distances) * self.distances.itemsize + len(self.next_steps)
+
+    def distance(self, x: int, y: int) -> int:
+        return self.distances[y * self.size + x]
+
+    def next_step(self, x: int, y: int) -> Optional[str]:
+        return BIT_DIRECTIONS.get(self.next_steps[y * self.size + x])
+
+    def path_from(self, x: int, y: int) -> Optional[List[Tuple[int, int]]]:
+        # Cells from (x, y) to the nearest source, both ends included
+        size, steps = self.size, self.next_steps
+        index = y * size + x
+        if self.distances[index] < 0:
+            return None
+        offsets = {1: -size, 2: 1, 4: size, 8: -1}
+        path = [(x, y)]
+        while steps[index]:
+            index += offsets[steps[index]]
+            path.append((index % size, index // size))
+        return path
+
+def compute_distance_field(masks, size: int, sources: Iterable[int]) -> DistanceField:
+    """Level-by-level BFS from every source at once; each cell is visited once."""
+    table = _step_table(size)
+    distances = array("i", [-1]) * (size * size)
+    next_steps = bytearray(size * size)
+    frontier = list(dict.fromkeys(sources))
+    for index in frontier:
+        distances[index] = 0
+    depth = 0
+    while frontier:
+        depth += 1
+        reached = []
+        for index in frontier:
+            for offset, back in table[masks[index]]:
+                neighbor = index + offset
+                if distances[neighbor] < 0:
+                    distances[neighbor] = depth
+                    next_steps[neighbor] = back
+                    reached.append(neighbor)
+        frontier = reached
+    return DistanceField(size, frozenset(sources), distances, next_steps)
+
+class Navigator:
+    """Navigation queries for one labyrinth; fields are kept in the shared cache."""
+
+    def __init__(self, labyrinth_id: UUID, size: int, masks, cache: "NavigatorCache"):
+        self.labyrinth_id = labyrinth_id
+        self.size = size
+        self.masks = bytes(masks)
+        self.cache = cache
+
+    def index(self, x: int, y: int) -> int:
+        if not (0 <= x < self.size and 0 <= y < self.size):
+            raise ValueError(f"Cell ({x}, {y}) is outside the {self.size}x{self.size} labyrinth")
+        return y * self.size + x
+
+    def field(self, targets: Iterable[Tuple[int, int]]) -> DistanceField:
+        sources = frozenset(self.index(x, y) for x, y in targets)
+        if not sources:
+            raise ValueError("At least one target cell is required")
+        key = (self.labyrinth_id, sources)
+        field = self.cache.cached_field(key)
+        if field is None:
+            # Computed outside the lock; a concurrent duplicate just loses the race
+            field = compute_distance_field(self.masks, self.size, sources)
+            self.cache.store_field(key, field)
+        return field
+
+    def distance(self, start: Tuple[int, int], goal: Tuple[int, int]) -> int:
+        return self.field([goal]).distance(*start)
+
+    def next_step(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[str]:
+        return self.field([goal]).next_step(*start)
+
+    def shortest_path(self, start: Tuple[int, int], goal: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        self.index(*start)
+        return self.field([goal]).path_from(*start)
+
+    def nearest(self, start: Tuple[int, int], targets: Iterable[Tuple[int, int]]):
+        # -> (target reached, distance, path) for the closest of several targets
+        self.index(*start)
+        field = self.field(targets)
+        path = field.path_from(*start)
+        if path is None:
+            return None, -1, None
+        return path[-1], len(path) - 1, path
+
+class NavigatorCache:
+    """Navigators by labyrinth id, and one LRU of their distance fields bounded
+    by total bytes; layouts are immutable, so entries never go stale."""
+
+    def __init__(self, max_entries: int, max_field_bytes: int):
+        self.max_entries = max_entries
+        self.max_field_bytes = max_field_bytes
+        self._navigators: Dict[UUID, Navigator] = OrderedDict()
+        self._fields = OrderedDict()  # (labyrinth id, frozenset of source indexes) -> DistanceField, oldest first
+        self._field_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, labyrinth_id: UUID, size: int, masks) -> Navigator:
+        with self._lock:
+            navigator = self._navigators.get(labyrinth_id)
+            if navigator is None:
+                navigator = self._navigators[labyrinth_id] = Navigator(labyrinth_id, size, masks, self)
+                while len(self._navigators) > self.max_entries:
+                    self._navigators.popitem(last=False)
+            else:
+                self._navigators.move_to_end(labyrinth_id)
+            return navigator
+
+    def cached_field(self, key) -> Optional[DistanceField]:
+        with self._lock:
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return field
+
+    def store_field(self, key, field: DistanceField):
+        # One field of a huge board would flush everything else
+        if field.nbytes > self.max_field_bytes // 4:
+            return
+        with self._lock:
+            if key in self._fields:
+                return
+            self._fields[key] = field
+            self._field_bytes += field.nbytes
+            while self._field_bytes > self.max_field_bytes:
+                _, evicted = self._fields.popitem(last=False)
+                self._field_bytes -= evicted.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "labyrinths": len(self._navigators),
+                "fields": len(self._fields),
+                "field_bytes": self._field_bytes,
+                "max_field_bytes": self.max_field_bytes,
+                "field_hits": self.hits,
+                "field_misses": self.misses
+            }
+
+navigators = NavigatorCache(config.NAVIGATION_CACHE_SIZE, config.NAVIGATION_FIELDS_BYTES)
+
+def navigator_for(record) -> Navigator:
+    # record: utils.labyrinth_cache.LabyrinthRecord
+    return navigators.get(record.id, record.size, record.masks)
@@ -0,0 +1,78 @@
+# utils/session_listing.py
+"""Keyset-paginated game session listing shared by /api/game_sessions and /game-sessions.
+
+Sessions are listed newest first on (created_at, id). A page's cursor encodes
+the last row it returned, so the next page starts right after it no matter
+how many sessions were created in between, and no OFFSET scan is needed.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+import base64
+import binascii
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.sql import Select
+from models.game_session import GameSession
+from models.mobile_client import MobileClient
+import config
+
+SESSION_STATUSES = ("open", "full")
+
+def encode_cursor(created_at: datetime, session_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    # Raises ValueError for anything encode_cursor did not produce
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, session_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(session_id)
+    except (TypeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+def session_page_query(limit: int, cursor: Optional[str] = None, size: Optional[int] = None,
+                       status: Optional[str] = None) -> Select:
+    """(GameSession, client_count) rows for one page, plus one extra row to
+    tell whether another page follows. Client counts come from the same query."""
+    client_count = func.count(MobileClient.id).label("client_count")
+    stmt = (
+        select(GameSession, client_count)
+        .outerjoin(MobileClient, MobileClient.game_session_id == GameSession.id)
+        .group_by(GameSession.id)
+    )
+    if size is not None:
+        stmt = stmt.where(GameSession.size == size)
+    if status == "open":
+        stmt = stmt.having(client_count < config.MAX_PLAYERS_PER_SESSION)
+    elif status == "full":
+        stmt = stmt.having(client_count >= config.MAX_PLAYERS_PER_SESSION)
+    if cursor:
+        created_at, session_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            GameSession.created_at < created_at,
+            and_(GameSession.created_at == created_at, GameSession.id < session_id)
+        ))
+    return stmt.order_by(GameSession.created_at.desc(), GameSession.id.desc()).limit(limit + 1)
+
+def split_page(rows, limit: int):
+    # -> (rows on this page, cursor for the next page or None)
+    page = rows[:limit]
+    if len(rows) <= limit:
+        return page, None
+    last = page[-1][0]
+    return page, encode_cursor(last.created_at, last.id)
+
+def session_summary(session: GameSession, client_count: int) -> dict:
+    return {
+        "id": str(session.id),
+        "seed": session.seed,
+        "size": session.size,
+        "labyrinth_id": str(session.labyrinth_id),
+        "start_x": session.start_x,
+        "start_y": session.start_y,
+        "created_at": session.created_at.isoformat(),
+        "client_count": client_count,
+        "max_players": config.MAX_PLAYERS_PER_SESSION,
+        "status": "full" if client_count >= config.MAX_PLAYERS_PER_SESSION else "open"
+    }
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from utils.labyrinth_grid import generate_masks
+import config
+
+class WorkerQueueFull(Exception):
+    """Raised instead of queueing a job when the worker queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Worker queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class WorkerPools:
+    """Bounded executors for blocking work started from async handlers.
+
+    Threads run synchronous SQLAlchemy work; a (lazily started) process pool
+    runs generation of large boards so it holds neither the event loop nor the
+    GIL. Admission control caps queued + running jobs: past max_pending, submit
+    raises WorkerQueueFull instead of letting a burst pile up behind the loop.
+    """
+
+    def __init__(self, db_threads: int, cpu_processes: int, max_pending: int, retry_after: int):
+        self.db_threads = db_threads
+        self.cpu_processes = cpu_processes
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self._cpu_executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def db_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._db_executor is None:
+                self._db_executor = ThreadPoolExecutor(
+                    max_workers=self.db_threads, thread_name_prefix="epsilon-db"
+                )
+            return self._db_executor
+
+    @property
+    def cpu_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._cpu_executor is None:
+                # spawn, not fork: the parent has an event loop and DB connections
+                self._cpu_executor = ProcessPoolExecutor(
+                    max_workers=self.cpu_processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._cpu_executor
+
+    async def run_db(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise WorkerQueueFull(self.retry_after)
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # run_in_executor does not carry contextvars over; copy them so
+            # per-request state (db.engine.request_checkouts) is seen in the thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self.db_executor, context.run, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def generate_masks(self, size: int, seed: Optional[str] = None):
+        # Called from a DB worker thread: large boards are generated in a
+        # separate process while the thread waits, small ones inline.
+        if size < config.WORKER_PROCESS_MIN_SIZE:
+            return generate_masks(size, seed)
+        return self.cpu_executor.submit(generate_masks, size, seed).result()
+
+    def shutdown(self):
+        with self._lock:
+            executors, self._db_executor, self._cpu_executor = (
+                (self._db_executor, self._cpu_executor), None, None
+            )
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "db_threads": self.db_threads,
+                "cpu_processes": self.cpu_processes,
+                "cpu_pool_started": self._cpu_executor is not None
+            }
+
+worker_pools = WorkerPools(
+    db_threads=config.WORKER_DB_THREADS,
+    cpu_processes=config.WORKER_CPU_PROCESSES,
+    max_pending=config.WORKER_MAX_PENDING_JOBS,
+    retry_after=config.WORKER_RETRY_AFTER_SECONDS
+)
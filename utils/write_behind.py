@@ -0,0 +1,131 @@
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
+from uuid import UUID
+import asyncio
+import logging
+import time
+from sqlalchemy import select
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+from models.game_session import GameSession
+
+logger = logging.getLogger(__name__)
+
+def existing_session_ids(db: Session, session_ids: Iterable[str]) -> Set[str]:
+    # Session-scoped batches skip sessions deleted since the change was marked
+    # instead of failing on the foreign key
+    ids = {UUID(session_id) for session_id in session_ids}
+    return {str(sid) for sid in db.scalars(select(GameSession.id).where(GameSession.id.in_(ids)))}
+
+class WriteBehind:
+    """Latest-value-wins buffer of pending rows, written in one batch per flush.
+
+    Game state lives in memory; mark() records the newest value for a key and
+    never touches the database. run() flushes every `interval` seconds, or
+    sooner once `max_pending` keys are dirty, so a crash loses at most about
+    one interval of updates.
+
+    When a batch fails it is retried row by row, so one bad row cannot hold
+    back the rest. Rows that fail on a database outage are put back (values
+    marked since then win) and retried on the next round; a row the database
+    keeps rejecting is dropped after `max_attempts` rounds.
+    """
+
+    def __init__(self, name: str, write: Callable, interval: float, max_pending: int, max_attempts: int = 3):
+        self.name = name
+        # write(db, batch) runs in a worker thread with a fresh Session and commits
+        self.write = write
+        self.interval = interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending: Dict[Hashable, object] = {}
+        self._attempts: Dict[Hashable, int] = {}  # key -> rounds its row was rejected
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.failures = 0
+        self.dropped = 0
+        self.max_batch = 0
+        self.last_flush_ms = 0.0
+
+    def mark(self, key: Hashable, value):
+        self._pending[key] = value
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _write_batch(self, batch: dict):
+        from db.session import get_session_factory
+        with get_session_factory()() as db:
+            self.write(db, batch)
+
+    def _write_rows(self, batch: dict):
+        # -> ({key: value} to retry, {key: value} the database rejected)
+        retry, rejected = {}, {}
+        items = list(batch.items())
+        for i, (key, value) in enumerate(items):
+            try:
+                self._write_batch({key: value})
+            except (OperationalError, InterfaceError):
+                # The database is unreachable, not this row: retry the rest later
+                retry.update(items[i:])
+                break
+            except Exception:
+                logger.exception("Write-behind %s row %r rejected", self.name, key)
+                rejected[key] = value
+        return retry, rejected
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            retry, rejected = {}, {}
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception:
+                self.failures += 1
+                logger.exception("Write-behind flush of %d %s rows failed", len(batch), self.name)
+                retry, rejected = await asyncio.to_thread(self._write_rows, batch)
+            written = len(batch) - len(retry) - len(rejected)
+            for key, value in rejected.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts >= self.max_attempts:
+                    self._attempts.pop(key, None)
+                    self.dropped += 1
+                    logger.error("Dropping write-behind %s row %r after %d attempts", self.name, key, attempts)
+                else:
+                    self._attempts[key] = attempts
+                    retry[key] = value
+            for key in batch.keys() - retry.keys() - rejected.keys():
+                self._attempts.pop(key, None)
+            retry.update(self._pending)
+            self._pending = retry
+            self.last_flush_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.rows_written += written
+            self.max_batch = max(self.max_batch, len(batch))
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "max_batch": self.max_batch,
+            "last_flush_ms": self.last_flush_ms,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "interval_seconds": self.interval
+        }